@@ -0,0 +1,224 @@
+# utils/bench.py
+# Benchmarks dos caminhos quentes de db/logic, sem Streamlit, sobre bancos
+# sintéticos com o schema real (db.init_db). Resultado em JSON Lines.
+#
+#   python -m utils.bench --scale 100x1000 --scale 1000x100000 --out bench.jsonl
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import pandas as pd
+from . import db, logic
+
+DEFAULT_SCALES = ["100x1000", "1000x10000"]
+
+# Distribuições aproximadas do uso real
+PROJECT_STATUS = {"Em andamento": 55, "Em Risco": 15, "Backlog": 20, "Concluído": 10}
+TASK_STATUS = {"A fazer": 30, "Fazendo": 30, "Bloqueado": 10, "Feito": 30}
+PROBABILITY = {"Baixa": 50, "Média": 35, "Alta": 15}
+IMPACT = {"Baixo": 40, "Médio": 40, "Alto": 20}
+EFFORT = {1: 20, 2: 25, 3: 25, 5: 15, 8: 10, 13: 5}
+AREAS = ["Geral", "TI", "RH", "Financeiro", "Marketing", "Operações", "Comercial", "Logística"]
+
+def _choices(rnd, dist, k):
+    return rnd.choices(list(dist), weights=list(dist.values()), k=k)
+
+def generate_database(path, n_projects, n_tasks, n_risks=None, n_notes=None, seed=0, batch=50000, null_effort=0.0):
+    """
+    Cria um banco sintético em `path` com o schema de db.init_db.
+    Por padrão: 1 risco para cada 5 tarefas e 1 nota para cada 2 projetos (~20% Gaps).
+    Projetos têm ids 1..n_projects. null_effort: fração de tarefas sem esforço
+    (0 = coluna effort inteira, o caso comum; > 0 = coluna float com NaN).
+    """
+    rnd = random.Random(seed)
+    n_risks = n_tasks // 5 if n_risks is None else n_risks
+    n_notes = n_projects // 2 if n_notes is None else n_notes
+    today = date.today()
+
+    db.DB_PATH = path
+    db.reset_db()
+    db.ensure_db()
+    db.execute_command("DELETE FROM projects")
+
+    def insert(query, rows):
+        for i in range(0, len(rows), batch):
+            db.execute_many(query, rows[i:i + batch])
+
+    projects = []
+    for i, status in enumerate(_choices(rnd, PROJECT_STATUS, n_projects)):
+        start = today - timedelta(days=rnd.randint(0, 365))
+        end = start + timedelta(days=rnd.randint(15, 300))
+        # id explícito: o DELETE acima não zera a sequência AUTOINCREMENT do projeto semente
+        projects.append((i + 1, f"Projeto {i}", f"PRJ-{i:05d}", rnd.choice(AREAS), f"Gerente {i % 50}",
+                         start.isoformat(), end.isoformat(), status, 1 if rnd.random() < 0.1 else 0))
+    insert("INSERT INTO projects (id, name, code, sponsor, manager, start_date, end_date, status, archived) VALUES (?,?,?,?,?,?,?,?,?)", projects)
+
+    tasks = []
+    efforts = _choices(rnd, EFFORT, n_tasks)
+    for i, status in enumerate(_choices(rnd, TASK_STATUS, n_tasks)):
+        start = today - timedelta(days=rnd.randint(0, 200))
+        end = start + timedelta(days=rnd.randint(1, 60))
+        progress = 100 if status == "Feito" else rnd.randint(0, 90)
+        tasks.append((rnd.randint(1, n_projects), f"Tarefa {i}", f"Dono {i % 200}", start.isoformat(), end.isoformat(),
+                      status, None if rnd.random() < null_effort else efforts[i], progress))
+    insert("INSERT INTO tasks (project_id, title, owner, start_date, end_date, status, effort, progress) VALUES (?,?,?,?,?,?,?,?)", tasks)
+
+    risks = [(rnd.randint(1, n_projects), f"Risco {i}", p, imp, "Plano")
+             for i, (p, imp) in enumerate(zip(_choices(rnd, PROBABILITY, n_risks), _choices(rnd, IMPACT, n_risks)))]
+    insert("INSERT INTO risks (project_id, description, probability, impact, mitigation_plan) VALUES (?,?,?,?,?)", risks)
+
+    notes = [(rnd.randint(1, n_projects), "Gap" if rnd.random() < 0.2 else "Link", f"Nota {i}", today.isoformat())
+             for i in range(n_notes)]
+    insert("INSERT INTO project_notes (project_id, category, description, created_at) VALUES (?,?,?,?)", notes)
+    return {'projects': n_projects, 'tasks': n_tasks, 'risks': n_risks, 'notes': n_notes}
+
+def _time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {'ms_median': round(statistics.median(times), 3), 'ms_min': round(min(times), 3), 'repeat': repeat}
+
+def _cold(fn):
+    """Executa fn com o cache de leitura vazio (mede a carga real do SQLite)"""
+    def run():
+        db.invalidate_cache()
+        return fn()
+    return run
+
+def check_progress():
+    """
+    Confere o avanço ponderado nos dois caminhos (pandas sobre load_table e project_summary)
+    com esforço inteiro não nulo. Levanta AssertionError se divergirem.
+    """
+    # Caso mínimo: 90% de 100 + 40% de 50 = 73,3% (em int8, progress * effort estoura)
+    tasks = db.compact_frame(pd.DataFrame({'id': [1, 2], 'project_id': [1, 1], 'effort': [100, 50], 'progress': [90, 40]}))
+    assert logic.calculate_progress(tasks) == 73.3, logic.calculate_progress(tasks)
+
+    projects = db.load_table("projects")
+    active = projects[projects['archived'] == 0]
+    frame = logic.compute_progress_frame(active, db.load_table("tasks"))['progress']
+    summary = db.load_project_summary()
+    expected = pd.Series(logic.summary_progress(summary).to_numpy(), index=summary['id'].astype(int))
+    got = pd.Series(frame.to_numpy(), index=active['id'].astype(int)).reindex(expected.index)
+    diff = (got - expected).abs()
+    assert (diff <= 0.1).all(), f"avanço divergente em {int((diff > 0.1).sum())} projetos"
+
+def run_cases(repeat=3, sample=200):
+    """
+    Mede os caminhos quentes sobre o banco atual (db.DB_PATH).
+    Funções linha a linha (calculate_project_health, calculate_delay, calculate_progress)
+    rodam sobre uma amostra de `sample` projetos/tarefas; `rows` indica o tamanho medido.
+    """
+    projects = db.run_query("SELECT * FROM projects", parse_dates=db.DATE_COLUMNS["projects"])
+    tasks = db.run_query("SELECT * FROM tasks", parse_dates=db.DATE_COLUMNS["tasks"])
+    risks = db.run_query("SELECT * FROM risks")
+    notes = db.run_query("SELECT * FROM project_notes")
+    active = projects[projects['archived'] == 0]
+    p_sample = active.head(sample)
+    t_sample = tasks.head(sample * 10)
+
+    def dashboard_pandas():
+        p = db.load_table("projects")
+        a = p[p['archived'] == 0]
+        t, r, n = db.load_table("tasks"), db.load_table("risks"), db.load_table("project_notes")
+        gaps = logic.build_gap_index(n, a['id'])
+        logic.compute_health_frame(a, r, gaps)
+        logic.compute_progress_frame(a, t)
+        logic.calculate_delays(t[t['project_id'].isin(a['id'])]).sum()
+
+    def dashboard_summary():
+        s = db.load_project_summary()
+        logic.compute_health_from_summary(s)
+        logic.summary_progress(s)
+        logic.calculate_time_pct(s)
+        db.count_late_tasks()
+
+    # Escritas sem efeito nos dados (progress = progress), mas com commit real
+    ids = [int(i) for i in tasks['id'].head(sample)]
+    touch = "UPDATE tasks SET progress = progress WHERE id = ?"
+
+    def writes_queued():
+        for fut in [db.submit_write(touch, (i,)) for i in ids]:
+            fut.result()
+
+    cases = [
+        ("run_query.projects", len(projects), lambda: db.run_query("SELECT * FROM projects")),
+        ("run_query.tasks", len(tasks), lambda: db.run_query("SELECT * FROM tasks")),
+        ("load_table.tasks.cold", len(tasks), _cold(lambda: db.load_table("tasks"))),
+        ("load_table.tasks.warm", len(tasks), lambda: db.load_table("tasks")),
+        ("calculate_project_health.rowwise", len(p_sample),
+         lambda: p_sample.apply(lambda x: logic.calculate_project_health(x, tasks[tasks['project_id'] == x['id']], risks), axis=1)),
+        ("compute_health_frame", len(active), lambda: logic.compute_health_frame(active, risks, notes)),
+        ("calculate_delay.rowwise", len(t_sample), lambda: t_sample.apply(logic.calculate_delay, axis=1)),
+        ("calculate_delays", len(tasks), lambda: logic.calculate_delays(tasks)),
+        ("calculate_progress.rowwise", len(p_sample),
+         lambda: [logic.calculate_progress(tasks[tasks['project_id'] == pid]) for pid in p_sample['id']]),
+        ("compute_progress_frame", len(active), lambda: logic.compute_progress_frame(active, tasks)),
+        ("dashboard.pandas.cold", len(active), _cold(dashboard_pandas)),
+        ("dashboard.summary.cold", len(active), _cold(dashboard_summary)),
+        ("dashboard.summary.warm", len(active), dashboard_summary),
+        ("dashboard_kpis.sql.cold", len(active), _cold(db.dashboard_kpis)),
+        ("write.execute_command", len(ids), lambda: [db.execute_command(touch, (i,)) for i in ids]),
+        ("write.execute_batch", len(ids), lambda: db.execute_batch([(touch, (i,)) for i in ids])),
+        ("write.submit_write", len(ids), writes_queued),
+    ]
+    results = []
+    for name, rows, fn in cases:
+        results.append({'case': name, 'rows': rows, **_time(fn, repeat)})
+    return results
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'sqlite': db.sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def _parse_scale(text):
+    p, t = text.lower().split("x")
+    return int(p), int(t)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de db/logic com dados sintéticos")
+    parser.add_argument("--scale", action="append", help="PROJETOSxTAREFAS (repetível). Padrão: " + ", ".join(DEFAULT_SCALES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sample", type=int, default=200, help="Amostra para as funções linha a linha")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--null-effort", type=float, default=0.0, help="Fração de tarefas sem esforço (0-1)")
+    parser.add_argument("--label", default="", help="Rótulo da versão medida (ex.: hash do commit)")
+    parser.add_argument("--workdir", default=None, help="Pasta dos bancos sintéticos (padrão: temporária)")
+    parser.add_argument("--out", default=None, help="Arquivo JSON Lines (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="gp_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    env = _environment()
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for scale in args.scale or DEFAULT_SCALES:
+            n_projects, n_tasks = _parse_scale(scale)
+            path = os.path.join(workdir, f"bench_{n_projects}x{n_tasks}.db")
+            t0 = time.perf_counter()
+            sizes = generate_database(path, n_projects, n_tasks, seed=args.seed, null_effort=args.null_effort)
+            gen_ms = round((time.perf_counter() - t0) * 1000, 1)
+            check_progress()
+            for result in run_cases(args.repeat, args.sample):
+                record = {'label': args.label, 'scale': scale, **sizes, 'generate_ms': gen_ms, **result, **env}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if args.out:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# utils/bulk.py
+# Importação / exportação em lote (CSV ou Parquet) para projects, tasks e risks.
+#
+#   python -m utils.bulk import tasks backlog.csv
+#   python -m utils.bulk export tasks tarefas.parquet --chunksize 10000
+import argparse
+import csv
+import os
+import pandas as pd
+from . import db
+
+BULK_TABLES = ("projects", "tasks", "risks")
+REQUIRED_COLUMNS = {
+    "projects": ["name"],
+    "tasks": ["project_id", "title"],
+    "risks": ["project_id", "description"],
+}
+DEFAULT_CHUNKSIZE = 5000
+# Tipos declarados que recebem conversão numérica na importação
+NUMERIC_TYPES = ("INTEGER", "REAL")
+
+def _check_table(table):
+    if table not in BULK_TABLES:
+        raise ValueError(f"Tabela não suportada: {table} (use {', '.join(BULK_TABLES)})")
+
+def _file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Formato não suportado: {path} (use .csv ou .parquet)")
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Arquivos Parquet exigem o pacote pyarrow (pip install pyarrow)")
+    return pyarrow
+
+def table_schema(table):
+    """Colunas e tipos declarados da tabela (PRAGMA table_info)"""
+    info = db.run_query(f"PRAGMA table_info({table})")
+    return dict(zip(info['name'], info['type'].str.upper()))
+
+def validate_columns(table, columns):
+    """Confere as colunas do arquivo contra o schema; ValueError se não baterem"""
+    _check_table(table)
+    schema = table_schema(table)
+    unknown = [c for c in columns if c not in schema]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas para '{table}': {', '.join(unknown)}")
+    missing = [c for c in REQUIRED_COLUMNS[table] if c not in columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes para '{table}': {', '.join(missing)}")
+
+def _read_chunks(path, chunksize):
+    if _file_format(path) == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+    else:
+        pq = _pyarrow().parquet
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+def _normalize_dates(table, chunk):
+    """Datas gravadas sempre como texto ISO (AAAA-MM-DD); ValueError se inválidas"""
+    for col in db.DATE_COLUMNS.get(table, ()):
+        if col not in chunk.columns:
+            continue
+        parsed = pd.to_datetime(chunk[col], errors="coerce", format="ISO8601")
+        # Fora do ISO: formato brasileiro (DD/MM/AAAA)
+        other = chunk[col].notna() & parsed.isna()
+        if other.any():
+            parsed[other] = pd.to_datetime(chunk.loc[other, col], errors="coerce", format="mixed", dayfirst=True)
+        invalid = chunk[col].notna() & parsed.isna()
+        if invalid.any():
+            raise ValueError(f"Datas inválidas em '{col}': {', '.join(map(str, chunk.loc[invalid, col].head(5)))}")
+        chunk = chunk.assign(**{col: parsed.dt.strftime("%Y-%m-%d")})
+    return chunk
+
+def _normalize_numbers(types, chunk):
+    """Colunas INTEGER/REAL convertidas para número; ValueError se houver valor não numérico"""
+    for col in chunk.columns:
+        kind = types.get(col)
+        if kind not in NUMERIC_TYPES:
+            continue
+        parsed = pd.to_numeric(chunk[col], errors="coerce")
+        invalid = chunk[col].notna() & parsed.isna()
+        if kind == "INTEGER":
+            # 50.5 numa coluna inteira seria gravado como REAL pelo SQLite
+            invalid |= parsed.notna() & (parsed % 1 != 0)
+        if invalid.any():
+            raise ValueError(f"Valores inválidos em '{col}' ({kind}): {', '.join(map(str, chunk.loc[invalid, col].head(5)))}")
+        chunk = chunk.assign(**{col: parsed.astype("Int64" if kind == "INTEGER" else "float64")})
+    return chunk
+
+def import_file(table, path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Importa um CSV/Parquet em blocos de `chunksize` linhas: cada bloco vira um
+    executemany numa transação. Retorna o total de linhas inseridas.
+    """
+    _check_table(table)
+    total = 0
+    query = None
+    for chunk in _read_chunks(path, chunksize):
+        if query is None:
+            columns = list(chunk.columns)
+            validate_columns(table, columns)
+            types = table_schema(table)
+            query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        elif list(chunk.columns) != columns:
+            raise ValueError(f"Colunas inconsistentes entre blocos de {path}")
+        if chunk.empty:
+            continue
+        chunk = _normalize_dates(table, chunk)
+        chunk = _normalize_numbers(types, chunk)
+        # NaN -> NULL e tipos numpy -> tipos Python aceitos pelo sqlite3
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        db.execute_many(query, list(chunk.itertuples(index=False, name=None)))
+        total += len(chunk)
+    return total
+
+def _iter_rows(table, chunksize):
+    # A conexão fica emprestada do pool até o fim da leitura (ou até o gerador ser fechado)
+    with db.connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT * FROM {table} ORDER BY id")
+        columns = [d[0] for d in cur.description]
+        yield columns
+        while True:
+            rows = cur.fetchmany(chunksize)
+            if not rows:
+                break
+            yield rows
+
+def _arrow_types(pa, table, columns):
+    """
+    Tipo Arrow de cada coluna pelo que está gravado (typeof), não só pelo tipo declarado:
+    o SQLite aceita texto ou decimais numa coluna INTEGER (ex.: dados antigos).
+    """
+    declared = table_schema(table)
+    numeric = [c for c in columns if declared.get(c) in NUMERIC_TYPES]
+    stored = {}
+    if numeric:
+        kinds = db.run_query(" UNION ALL ".join(
+            f"SELECT '{c}' AS col, typeof({c}) AS kind FROM {table} GROUP BY 2" for c in numeric))
+        for col, kind in zip(kinds['col'], kinds['kind']):
+            stored.setdefault(col, set()).add(kind)
+    types = {}
+    for c in columns:
+        kinds = stored.get(c, set())
+        if c not in numeric or kinds & {"text", "blob"}:
+            types[c] = pa.string()
+        elif declared[c] == "REAL" or "real" in kinds:
+            types[c] = pa.float64()
+        else:
+            types[c] = pa.int64()
+    return types
+
+def export_table(table, path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Exporta a tabela para CSV/Parquet lendo o cursor em blocos (sem montar um
+    DataFrame com a tabela inteira). Retorna o total de linhas exportadas.
+    """
+    _check_table(table)
+    fmt = _file_format(path)
+    stream = _iter_rows(table, chunksize)
+    columns = next(stream)
+    total = 0
+
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for rows in stream:
+                writer.writerows(rows)
+                total += len(rows)
+        return total
+
+    pa = _pyarrow()
+    types = _arrow_types(pa, table, columns)
+    schema = pa.schema([(c, types[c]) for c in columns])
+    convert = {c: str if t == pa.string() else (float if t == pa.float64() else int) for c, t in types.items()}
+    with pa.parquet.ParquetWriter(path, schema) as writer:
+        for rows in stream:
+            data = {c: [None if v is None else convert[c](v) for v in col]
+                    for c, col in zip(columns, zip(*rows))}
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            total += len(rows)
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importação/exportação em lote do banco de projetos")
+    parser.add_argument("--db", default=db.DB_PATH, help="Arquivo SQLite (padrão: %(default)s)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Linhas por bloco/transação")
+    sub = parser.add_subparsers(dest="action", required=True)
+    for action in ("import", "export"):
+        p = sub.add_parser(action)
+        p.add_argument("table", choices=BULK_TABLES)
+        p.add_argument("path")
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    db.ensure_db()
+    if args.action == "import":
+        n = import_file(args.table, args.path, args.chunksize)
+        print(f"{n} linhas importadas em '{args.table}'")
+    else:
+        n = export_table(args.table, args.path, args.chunksize)
+        print(f"{n} linhas exportadas de '{args.table}' para {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# utils/cache.py
+# LRU em memória, thread-safe e compartilhado entre sessões do processo: cache de
+# leitura do db, figuras do charts e resultados/corpos JSON do service.
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """Dicionário limitado a `maxsize` entradas; ao passar do limite descarta a usada há mais tempo"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Valor de `key` (marcado como usado agora) ou `default`"""
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def values(self):
+        """Cópia dos valores (para medir memória sem segurar o lock)"""
+        with self._lock:
+            return list(self._data.values())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
\ No newline at end of file
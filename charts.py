@@ -0,0 +1,74 @@
+# utils/charts.py
+import random
+from datetime import date
+import plotly.express as px
+import plotly.graph_objects as go
+from . import db, profiling
+from .cache import LRUCache
+
+# Mapa de Cores
+COLOR_MAP = {
+    "Concluído": "#22C55E", "Feito": "#22C55E", "🟢 Saudável": "#22C55E",
+    "Em andamento": "#F59E0B", "Fazendo": "#3B82F6", "🟡 Atenção": "#F59E0B",
+    "Em Risco": "#EF4444", "Bloqueado": "#EF4444", "🔴 Crítico": "#EF4444",
+    "Backlog": "#9CA3AF", "A fazer": "#9CA3AF", "Cancelado": "#4B5563"
+}
+
+# =========================================================
+# CACHE DE FIGURAS (LRU, compartilhado entre sessões)
+# =========================================================
+FIGURE_CACHE_SIZE = 64
+
+_figures = LRUCache(FIGURE_CACHE_SIZE)
+
+def cached_figure(kind, filters, tables, build):
+    """
+    Devolve a figura de (kind, filters, versão dos dados) ou a constrói com
+    `build()`. A versão inclui as `tables` de origem e a data de hoje.
+    A figura é compartilhada entre sessões: não altere o objeto retornado.
+    """
+    key = (kind, filters, db.table_version(*tables), date.today())
+    fig = _figures.get(key)
+    if fig is not None:
+        with profiling.span(f"chart.{kind}", hit=True):
+            return fig
+    with profiling.span(f"chart.{kind}", hit=False):
+        fig = build()
+    _figures.put(key, fig)
+    return fig
+
+def clear_figure_cache():
+    _figures.clear()
+
+# =========================================================
+# GRÁFICOS
+# =========================================================
+def status_pie(df_status, values=None):
+    """Pizza de status dos projetos (values = coluna de contagem, se já agregado)"""
+    fig = px.pie(df_status, names='status', values=values, hole=0.6, color='status', color_discrete_map=COLOR_MAP)
+    fig.update_layout(showlegend=True, legend=dict(orientation="h", y=-0.2), margin=dict(t=0, b=0, l=0, r=0), height=300)
+    return fig
+
+def efficiency_combo(df_m):
+    """Barras de avanço real x marcador de tempo decorrido por projeto"""
+    fig_combo = go.Figure()
+    fig_combo.add_trace(go.Bar(y=df_m['Nome'], x=df_m['Avanço Real (%)'], name='Entrega Real', orientation='h', marker_color=[COLOR_MAP.get(h, "#ccc") for h in df_m['Saúde']], text=df_m['Avanço Real (%)'].apply(lambda x: f"{x:.0f}%"), textposition='auto'))
+    fig_combo.add_trace(go.Scatter(y=df_m['Nome'], x=df_m['Tempo Decorrido (%)'], name='Tempo Gasto', mode='markers', marker=dict(symbol='line-ns-open', size=30, color='#2E2E2E', line=dict(width=4))))
+    fig_combo.update_layout(height=400, xaxis=dict(range=[0, 105]), legend=dict(orientation="h", y=1.1))
+    return fig_combo
+
+def risk_matrix(risks_df, col_name):
+    """Matriz Probabilidade x Impacto (com leve dispersão para não sobrepor pontos)"""
+    rv = risks_df.copy()
+    m = {'Baixa':1,'Baixo':1,'Média':2,'Médio':2,'Alta':3,'Alto':3}
+    rv['px'] = rv['impact'].astype(object).map(m).fillna(2) + [random.uniform(-0.1,0.1) for _ in range(len(rv))]
+    rv['py'] = rv['probability'].astype(object).map(m).fillna(2) + [random.uniform(-0.1,0.1) for _ in range(len(rv))]
+    fig = go.Figure()
+    fig.add_vline(x=2.5, line_dash="dash", line_color="#ccc")
+    fig.add_hline(y=2.5, line_dash="dash", line_color="#ccc")
+    fig.add_trace(go.Scatter(x=rv['px'], y=rv['py'], mode='markers', hovertext=rv[col_name], marker=dict(size=20, color='#EF4444')))
+    fig.update_layout(title="Matriz", xaxis=dict(range=[0.5,3.5], tickvals=[1,2,3]), yaxis=dict(range=[0.5,3.5], tickvals=[1,2,3]), height=400, plot_bgcolor='white')
+    return fig
+
+def gantt_timeline(gantt, y_col):
+    return px.timeline(gantt, x_start="start_date", x_end="end_date", y=y_col, color="status", color_discrete_map=COLOR_MAP)
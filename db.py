@@ -1,14 +1,170 @@
 # utils/db.py
+import re
 import sqlite3
+import threading
+import time
 import pandas as pd
-from datetime import date, timedelta
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 import os
+import queue
+import random
+from concurrent.futures import Future, ThreadPoolExecutor
+from . import profiling
+from .cache import LRUCache
 
 DB_PATH = "project_management.db"
 
+# Copy-on-Write: filtros/atribuições em frames do cache não copiam dados até a
+# primeira escrita (no pandas >= 3 já é o padrão e a opção não existe mais)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.options.mode.copy_on_write = True
+
+# Pragmas aplicados a cada conexão nova (WAL + fsync reduzido). recursive_triggers:
+# sem ele, a linha apagada por INSERT OR REPLACE não dispara os triggers de DELETE
+# e project_summary deixa de descontá-la
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA recursive_triggers=ON",
+)
+
+# Contenção: cada conexão espera até BUSY_TIMEOUT_MS pelo lock do arquivo; se ainda
+# assim vier "database is locked", a operação é refeita até LOCK_RETRIES vezes
+BUSY_TIMEOUT_MS = int(os.environ.get("GESTAO_BUSY_TIMEOUT_MS", "5000"))
+LOCK_RETRIES = int(os.environ.get("GESTAO_LOCK_RETRIES", "5"))
+LOCK_BACKOFF = 0.05  # segundos na 1ª repetição, dobra a cada tentativa
+
+# Pool de conexões do processo: reaproveitadas por qualquer thread (reruns do
+# Streamlit, requisições HTTP, prefetch), uma thread por vez em cada conexão.
+# Até POOL_SIZE conexões livres ficam abertas; as excedentes são fechadas na devolução.
+# A geração é incrementada em reset_db() para que conexões antigas sejam descartadas.
+POOL_SIZE = int(os.environ.get("GESTAO_POOL_SIZE", "8"))
+_pool = []                 # conexões livres: (conn, generation, path)
+_pool_lock = threading.Lock()
+_held = threading.local()  # conexão emprestada à thread atual (blocos aninhados reusam)
+_generation = 0
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _acquire():
+    stale = []
+    with _pool_lock:
+        while _pool:
+            conn, generation, path = _pool.pop()
+            if generation == _generation and path == DB_PATH:
+                break
+            stale.append(conn)
+        else:
+            conn = None
+    for old in stale:
+        old.close()
+    if conn is None:
+        with profiling.span("db.connect"):
+            conn = _connect()
+        generation, path = _generation, DB_PATH
+    return conn, generation, path
+
+def _release(entry):
+    conn, generation, path = entry
+    if conn.in_transaction:
+        conn.rollback()
+    with _pool_lock:
+        if generation == _generation and path == DB_PATH and len(_pool) < POOL_SIZE:
+            _pool.append(entry)
+            return
+    conn.close()
+
+@contextmanager
+def connection():
+    """Empresta uma conexão do pool durante o bloco (na mesma thread, blocos aninhados usam a mesma)"""
+    conn = getattr(_held, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    entry = _acquire()
+    _held.conn = entry[0]
+    try:
+        yield entry[0]
+    finally:
+        _held.conn = None
+        _release(entry)
+
+def close_connections():
+    """Fecha as conexões livres do pool e a de PRAGMA data_version (as emprestadas fecham na devolução)"""
+    global _generation
+    with _pool_lock:
+        _generation += 1
+        idle, _pool[:] = list(_pool), []
+    for conn, _gen, _path in idle:
+        conn.close()
+    # Sem handles abertos: no Windows, os.remove falha se o arquivo ainda estiver aberto
+    with _cache_lock:
+        if _watch['conn'] is not None:
+            _watch['conn'].close()
+            _watch.update(conn=None, generation=None, path=None, data_version=None)
+
+def reset_db():
+    """Apaga o arquivo do banco (e os arquivos -wal/-shm) e invalida as conexões"""
+    close_connections()
+    invalidate_cache()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    # Tabelas + seed numa única transação de escrita
+    def apply(conn):
+        c = conn.cursor()
+        _create_tables(c)
+        _seed(c)
+    _write(apply)
+    migrate()
+    _bump_versions(TABLES)
+
+# --- PARTIDA A QUENTE ---
+# Arquivos já inicializados neste processo: sessões novas só fazem leituras
+_ready = set()
+_ready_lock = threading.Lock()
+_startup = {}
+
+def ensure_db():
+    """
+    Roda init_db uma única vez por processo e arquivo de banco, e só se o
+    schema não estiver na versão atual. Retorna True se houve inicialização.
+    """
+    key = (os.path.abspath(DB_PATH), _generation)
+    if key in _ready and os.path.exists(DB_PATH):
+        return False
+    with _ready_lock:
+        if key in _ready and os.path.exists(DB_PATH):
+            return False
+        t0 = time.perf_counter()
+        cold = not os.path.exists(DB_PATH) or schema_version() < SCHEMA_VERSION
+        if cold:
+            init_db()
+        _ready.add(key)
+        _startup.update({
+            'db_path': key[0],
+            'cold_start': cold,
+            'ensure_db_ms': round((time.perf_counter() - t0) * 1000, 2),
+            'schema_version': SCHEMA_VERSION,
+            'checked_at': datetime.now().isoformat(timespec='seconds'),
+        })
+    return cold
+
+def startup_report():
+    """Resumo da última inicialização do banco neste processo"""
+    return dict(_startup)
+
+def _create_tables(c):
     
     # 1. Projetos
     c.execute('''CREATE TABLE IF NOT EXISTS projects (
@@ -79,16 +235,128 @@ def init_db():
         email TEXT,
         phone TEXT
     )''')
-    
-    conn.commit()
-    conn.close()
-    
-    seed_data()
+
+# --- RESUMO MATERIALIZADO POR PROJETO (project_summary) ---
+# Mantido por triggers com deltas (soma na inserção, subtrai na exclusão), então
+# cada escrita em tasks/risks/project_notes custa O(1), inclusive em carga em lote.
+# O avanço ponderado é derivado das somas na leitura (logic.summary_progress).
+_SUMMARY_DELTAS = {
+    "tasks": {
+        "task_count": "1",
+        "effort_sum": "COALESCE({r}.effort, 0)",
+        "weighted_sum": "COALESCE({r}.progress * {r}.effort, 0)",
+        "progress_sum": "COALESCE({r}.progress, 0)",
+        "progress_count": "{r}.progress IS NOT NULL",
+    },
+    "risks": {
+        "high_risks": "COALESCE({r}.probability, '') = 'Alta'",
+        "medium_risks": "COALESCE({r}.probability, '') = 'Média'",
+    },
+    "project_notes": {
+        "gap_count": "instr(COALESCE({r}.category, ''), 'Gap') > 0",
+    },
+}
+SUMMARY_COLUMNS = [c for deltas in _SUMMARY_DELTAS.values() for c in deltas]
+
+def _summary_apply_sql(table, row, sign):
+    sets = ", ".join(f"{col} = {col} {sign} ({expr.format(r=row)})" for col, expr in _SUMMARY_DELTAS[table].items())
+    # NOT EXISTS em vez de OR IGNORE: num INSERT OR REPLACE externo, o OR IGNORE do trigger
+    # vira REPLACE (o conflito do comando externo prevalece) e zeraria a linha do resumo
+    return (f"INSERT INTO project_summary (project_id) SELECT {row}.project_id WHERE {row}.project_id IS NOT NULL "
+            f"AND NOT EXISTS (SELECT 1 FROM project_summary WHERE project_id = {row}.project_id); "
+            f"UPDATE project_summary SET {sets} WHERE project_id = {row}.project_id;")
+
+def _summary_triggers():
+    stmts = []
+    for table in _SUMMARY_DELTAS:
+        stmts.append(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_summary_ins AFTER INSERT ON {table} "
+                     f"BEGIN {_summary_apply_sql(table, 'NEW', '+')} END")
+        stmts.append(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_summary_del AFTER DELETE ON {table} "
+                     f"BEGIN {_summary_apply_sql(table, 'OLD', '-')} END")
+        stmts.append(f"CREATE TRIGGER IF NOT EXISTS trg_{table}_summary_upd AFTER UPDATE ON {table} "
+                     f"BEGIN {_summary_apply_sql(table, 'OLD', '-')} {_summary_apply_sql(table, 'NEW', '+')} END")
+    stmts.append("CREATE TRIGGER IF NOT EXISTS trg_projects_summary_del AFTER DELETE ON projects "
+                 "BEGIN DELETE FROM project_summary WHERE project_id = OLD.id; END")
+    # INSERT OR REPLACE em projects passa por trg_projects_summary_del (recursive_triggers):
+    # o resumo do projeto reinserido é recalculado das tabelas filhas
+    stmts.append("CREATE TRIGGER IF NOT EXISTS trg_projects_summary_ins AFTER INSERT ON projects BEGIN "
+                 f"INSERT OR REPLACE INTO project_summary (project_id, {', '.join(SUMMARY_COLUMNS)}) {_summary_select_sql('NEW.id')}; END")
+    return stmts
+
+def _summary_trigger_names():
+    names = [f"trg_{table}_summary_{kind}" for table in _SUMMARY_DELTAS for kind in ("ins", "del", "upd")]
+    return names + ["trg_projects_summary_del", "trg_projects_summary_ins"]
+
+def _summary_select_sql(project_id=None):
+    """Resumo recalculado do zero a partir das tabelas (rebuild / conferência); project_id: expressão SQL de um projeto só"""
+    only = f" AND project_id = {project_id}" if project_id is not None else ""
+    parts = []
+    for table, deltas in _SUMMARY_DELTAS.items():
+        cols = ", ".join(f"SUM({deltas[c].format(r=table)}) AS {c}" if c in deltas else f"0 AS {c}" for c in SUMMARY_COLUMNS)
+        parts.append(f"SELECT project_id, {cols} FROM {table} WHERE project_id IS NOT NULL{only} GROUP BY project_id")
+    sums = ", ".join(f"SUM({c}) AS {c}" for c in SUMMARY_COLUMNS)
+    return f"SELECT project_id, {sums} FROM ({' UNION ALL '.join(parts)}) GROUP BY project_id"
+
+_SUMMARY_TABLE_SQL = f"""CREATE TABLE IF NOT EXISTS project_summary (
+        project_id INTEGER PRIMARY KEY,
+        {", ".join(f"{c} {'REAL' if c.endswith('_sum') else 'INTEGER'} NOT NULL DEFAULT 0" for c in SUMMARY_COLUMNS)}
+    )"""
+
+# --- MIGRAÇÕES DE SCHEMA (PRAGMA user_version) ---
+# Lista ordenada (versão, descrição, comandos). Cada passo roda uma única vez,
+# numa transação própria, e os comandos devem ser idempotentes (IF NOT EXISTS).
+MIGRATIONS = [
+    (1, "Índices para filtros por projeto, status, arquivamento e datas", [
+        "CREATE INDEX IF NOT EXISTS idx_tasks_project_status ON tasks(project_id, status)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_end_date ON tasks(end_date, status)",
+        "CREATE INDEX IF NOT EXISTS idx_risks_project ON risks(project_id, probability)",
+        "CREATE INDEX IF NOT EXISTS idx_notes_project ON project_notes(project_id, category)",
+        "CREATE INDEX IF NOT EXISTS idx_projects_archived ON projects(archived, end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_projects_sponsor ON projects(archived, sponsor)",
+    ]),
+    (2, "Resumo materializado por projeto (project_summary) mantido por triggers", [
+        _SUMMARY_TABLE_SQL,
+        *_summary_triggers(),
+        "DELETE FROM project_summary",
+        f"INSERT INTO project_summary (project_id, {', '.join(SUMMARY_COLUMNS)}) {_summary_select_sql()}",
+    ]),
+    (3, "Índices de início para a janela do calendário", [
+        "CREATE INDEX IF NOT EXISTS idx_projects_archived_start ON projects(archived, start_date)",
+        "CREATE INDEX IF NOT EXISTS idx_tasks_start_date ON tasks(start_date)",
+    ]),
+    (4, "Triggers de project_summary consistentes com INSERT OR REPLACE", [
+        *(f"DROP TRIGGER IF EXISTS {name}" for name in _summary_trigger_names()),
+        *_summary_triggers(),
+        "DELETE FROM project_summary",
+        f"INSERT INTO project_summary (project_id, {', '.join(SUMMARY_COLUMNS)}) {_summary_select_sql()}",
+    ]),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version():
+    """Versão do schema gravada no arquivo (PRAGMA user_version)"""
+    with connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """Aplica as migrações pendentes, em ordem; retorna a versão final"""
+    for version, _desc, statements in MIGRATIONS:
+        if schema_version() >= version:
+            continue
+        # write_transaction (BEGIN IMMEDIATE) trava outros migradores; relê a versão já com a trava
+        def apply(conn, version=version, statements=statements):
+            if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                for sql in statements:
+                    conn.execute(sql)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+        _write(apply)
+    return schema_version()
 
 def seed_data():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
+    _write(lambda conn: _seed(conn.cursor()))
+    _bump_versions(("projects", "sponsors"))
+
+def _seed(c):
     # Seed Projetos
     c.execute("SELECT count(*) FROM projects")
     if c.fetchone()[0] == 0:
@@ -97,25 +365,672 @@ def seed_data():
     
     # Seed Areas
     default_areas = ["Geral", "TI", "RH", "Financeiro", "Marketing", "Operações", "Comercial", "Logística"]
-    for area in default_areas:
-        c.execute("INSERT OR IGNORE INTO sponsors (name) VALUES (?)", (area,))
-        
-    conn.commit()
-    conn.close()
+    c.executemany("INSERT OR IGNORE INTO sponsors (name) VALUES (?)", [(area,) for area in default_areas])
+
+# Colunas de data: gravadas como texto ISO (AAAA-MM-DD) e convertidas para
+# datetime64 uma única vez, na leitura
+DATE_COLUMNS = {
+    "projects": ("start_date", "end_date"),
+    "tasks": ("start_date", "end_date"),
+    "project_notes": ("created_at",),
+}
+
+def _parse_dates_spec(columns):
+    return {c: {"format": "ISO8601", "errors": "coerce"} for c in columns} or None
+
+# =========================================================
+# CONCORRÊNCIA: ESCRITOR ÚNICO + RETRY EM "database is locked"
+# =========================================================
+# Dentro do processo, as escritas passam por _write_lock (uma por vez); entre
+# processos, BEGIN IMMEDIATE pega o lock do arquivo já no início da transação.
+_write_lock = threading.RLock()
+_contention = {
+    'writes': 0,               # transações de escrita abertas (inclui tentativas repetidas)
+    'write_wait_ms': 0.0,      # tempo total esperando _write_lock
+    'write_wait_max_ms': 0.0,
+    'read_lock_errors': 0,
+    'write_lock_errors': 0,
+    'retries': 0,
+    'backoff_ms': 0.0,
+    'failures': 0,             # desistências após LOCK_RETRIES
+}
+_contention_lock = threading.Lock()
+
+def _is_locked(exc):
+    """'database is locked'/'busy' do SQLite (o pandas embrulha o erro original)"""
+    while exc is not None:
+        if isinstance(exc, sqlite3.OperationalError) and ("locked" in str(exc) or "busy" in str(exc)):
+            return True
+        exc = exc.__cause__
+    return False
+
+def _note(**deltas):
+    with _contention_lock:
+        for key, value in deltas.items():
+            if key.endswith('_max_ms'):
+                _contention[key] = max(_contention[key], value)
+            else:
+                _contention[key] += value
 
-def run_query(query, params=(), fetch=True):
-    conn = sqlite3.connect(DB_PATH)
+def contention_stats():
+    """Métricas de contenção acumuladas neste processo"""
+    with _contention_lock:
+        stats = dict(_contention)
+    stats['write_wait_ms'] = round(stats['write_wait_ms'], 3)
+    stats['write_wait_max_ms'] = round(stats['write_wait_max_ms'], 3)
+    stats['backoff_ms'] = round(stats['backoff_ms'], 3)
+    return stats
+
+def reset_contention_stats():
+    with _contention_lock:
+        for key in _contention:
+            _contention[key] = 0 if isinstance(_contention[key], int) else 0.0
+
+def _retry(fn, kind):
+    """Chama fn(); em lock do SQLite espera (backoff exponencial) e tenta de novo"""
+    for attempt in range(LOCK_RETRIES + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if not _is_locked(e):
+                raise
+            _note(**{f'{kind}_lock_errors': 1})
+            if attempt == LOCK_RETRIES:
+                _note(failures=1)
+                raise
+            delay = LOCK_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+            _note(retries=1, backoff_ms=delay * 1000)
+            time.sleep(delay)
+
+@contextmanager
+def write_transaction():
+    """Transação de escrita: um escritor por vez no processo e BEGIN IMMEDIATE"""
+    t0 = time.perf_counter()
+    with _write_lock:
+        waited = (time.perf_counter() - t0) * 1000
+        _note(writes=1, write_wait_ms=waited, write_wait_max_ms=waited)
+        with connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+def _write(fn):
+    """Executa fn(conn) numa transação de escrita, refazendo tudo se o banco estiver travado"""
+    def attempt():
+        with write_transaction() as conn:
+            return fn(conn)
+    return _retry(attempt, "write")
+
+def _sql_label(query):
+    return " ".join(query.split())[:200]
+
+def run_query(query, params=(), fetch=True, parse_dates=()):
     if fetch:
-        try: df = pd.read_sql(query, conn, params=params)
-        except: df = pd.DataFrame()
-        conn.close()
+        with connection() as conn, profiling.span("db.query", sql=_sql_label(query)) as sp:
+            try:
+                df = _retry(lambda: pd.read_sql(query, conn, params=params, parse_dates=_parse_dates_spec(parse_dates)), "read")
+            except Exception as e:
+                # Lock persistente sobe como erro (nunca um DataFrame vazio enganoso)
+                if _is_locked(e):
+                    raise
+                df = pd.DataFrame()
+            sp['rows'] = len(df)
         return df
     else:
-        c = conn.cursor()
-        c.execute(query, params)
-        conn.commit()
-        conn.close()
+        with profiling.span("db.execute", sql=_sql_label(query)):
+            _write(lambda conn: conn.execute(query, params))
+        _bump_versions(_tables_written(query))
         return None
 
 def execute_command(query, params=()):
-    return run_query(query, params, fetch=False)
\ No newline at end of file
+    if WRITE_QUEUE:
+        return submit_write(query, params).result()
+    return run_query(query, params, fetch=False)
+
+def execute_many(query, rows):
+    """Mesmo comando para várias linhas (executemany) numa única transação"""
+    with profiling.span("db.execute", sql=_sql_label(query), rows=len(rows)):
+        _write(lambda conn: conn.executemany(query, rows))
+    _bump_versions(_tables_written(query))
+
+# =========================================================
+# ESCRITAS EM LOTE
+# =========================================================
+# Com GESTAO_WRITE_QUEUE=1, execute_command passa pela fila: uma thread escritora
+# junta as escritas concorrentes das sessões e faz um único commit por grupo.
+WRITE_QUEUE = os.environ.get("GESTAO_WRITE_QUEUE", "0") == "1"
+WRITE_BATCH_MAX = 200       # lotes por commit
+WRITE_BATCH_WINDOW = 0.005  # segundos esperando outras escritas antes do commit
+
+_write_queue = queue.Queue()
+_writer = {'thread': None}
+_writer_lock = threading.Lock()
+
+def _statements(statements):
+    """Normaliza [sql | (sql, params)] para [(sql, params)]"""
+    return [(s, ()) if isinstance(s, str) else (s[0], s[1] if len(s) > 1 else ()) for s in statements]
+
+def _tables_of(stmts):
+    return {t for query, _ in stmts for t in _tables_written(query)}
+
+def execute_batch(statements):
+    """
+    Executa vários comandos numa única transação: ou todos são aplicados, ou nenhum.
+    statements: lista de SQL ou de (SQL, params).
+    """
+    stmts = _statements(statements)
+    if not stmts:
+        return
+    def apply(conn):
+        for query, params in stmts:
+            conn.execute(query, params)
+    with profiling.span("db.execute", sql=_sql_label(stmts[0][0]), statements=len(stmts)):
+        _write(apply)
+    _bump_versions(_tables_of(stmts))
+
+def submit_batch(statements):
+    """
+    Enfileira um lote atômico para a thread escritora.
+    Retorna um Future resolvido após o commit (ou com a exceção do lote).
+    """
+    fut = Future()
+    stmts = _statements(statements)
+    if not stmts:
+        fut.set_result(None)
+        return fut
+    _ensure_writer()
+    _write_queue.put((stmts, fut))
+    return fut
+
+def submit_write(query, params=()):
+    return submit_batch([(query, params)])
+
+def flush_writes():
+    """Bloqueia até a fila de escrita ser gravada"""
+    if _writer['thread'] is not None:
+        _write_queue.join()
+
+def _ensure_writer():
+    with _writer_lock:
+        t = _writer['thread']
+        if t is None or not t.is_alive():
+            t = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            t.start()
+            _writer['thread'] = t
+
+def _writer_loop():
+    while True:
+        items = [_write_queue.get()]
+        deadline = time.monotonic() + WRITE_BATCH_WINDOW
+        while len(items) < WRITE_BATCH_MAX:
+            try:
+                items.append(_write_queue.get(timeout=max(deadline - time.monotonic(), 0.0001)))
+            except queue.Empty:
+                break
+        try:
+            _commit_group(items)
+        except Exception as e:
+            # Falha fora dos lotes (ex.: ao invalidar o cache): ninguém fica esperando e a thread segue
+            for _, fut in items:
+                _resolve(fut, e)
+        finally:
+            for _ in items:
+                _write_queue.task_done()
+
+def _resolve(fut, error=None):
+    """Conclui o Future de um lote (ignora os já concluídos ou cancelados pelo chamador)"""
+    if fut.done():
+        return
+    if error is None:
+        fut.set_result(None)
+    else:
+        fut.set_exception(error)
+
+def _commit_group(items):
+    """Um commit para vários lotes; cada lote num SAVEPOINT (a falha de um não desfaz os outros)"""
+    def apply(conn):
+        errors = []
+        for stmts, _ in items:
+            conn.execute("SAVEPOINT lote")
+            try:
+                for query, params in stmts:
+                    conn.execute(query, params)
+            except Exception as e:
+                if _is_locked(e):
+                    raise  # refaz o grupo inteiro
+                conn.execute("ROLLBACK TO lote")
+                conn.execute("RELEASE lote")
+                errors.append(e)
+                continue
+            conn.execute("RELEASE lote")
+            errors.append(None)
+        return errors
+    try:
+        errors = _write(apply)
+    except Exception as e:
+        # Commit falhou: nada do grupo foi gravado
+        for _, fut in items:
+            _resolve(fut, e)
+        return
+    try:
+        _bump_versions(_tables_of([st for (stmts, _), err in zip(items, errors) if err is None for st in stmts]))
+    finally:
+        # Já gravado: os chamadores são liberados mesmo se a invalidação do cache falhar
+        for (_, fut), err in zip(items, errors):
+            _resolve(fut, err)
+
+# =========================================================
+# CACHE DE LEITURA (compartilhado entre sessões do processo)
+# =========================================================
+TABLES = ("projects", "tasks", "risks", "project_notes", "team_members", "sponsors")
+CACHE_MAX_ENTRIES = 256
+
+# Contador de escrita por tabela. Escritas de outros processos são detectadas
+# pelo PRAGMA data_version de uma conexão dedicada e invalidam tudo.
+_versions = dict.fromkeys(TABLES, 0)
+_external_version = 0
+_watch = {'conn': None, 'generation': None, 'path': None, 'data_version': None}
+_cache = LRUCache(CACHE_MAX_ENTRIES)
+_cache_lock = threading.RLock()  # versões das tabelas e conexão de data_version
+
+_WRITE_RE = re.compile(r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+[\"'`\[]?(\w+)", re.IGNORECASE)
+
+def _tables_written(query):
+    """Tabela alterada por um comando DML; DDL ou desconhecido afeta todas"""
+    m = _WRITE_RE.match(query)
+    if m and m.group(1).lower() in _versions:
+        return (m.group(1).lower(),)
+    return TABLES
+
+def _read_data_version():
+    w = _watch
+    if w['conn'] is None or w['generation'] != _generation or w['path'] != DB_PATH:
+        if w['conn'] is not None:
+            w['conn'].close()
+        w['conn'] = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+        w['generation'], w['path'], w['data_version'] = _generation, DB_PATH, None
+    return w['conn'].execute("PRAGMA data_version").fetchone()[0]
+
+def _bump_versions(tables):
+    with _cache_lock:
+        for t in tables:
+            _versions[t] += 1
+        _watch['data_version'] = _read_data_version()
+
+def _check_external_writes():
+    global _external_version
+    with _cache_lock:
+        dv = _read_data_version()
+        if dv != _watch['data_version']:
+            if _watch['data_version'] is not None:
+                _external_version += 1
+            _watch['data_version'] = dv
+
+def table_version(*tables):
+    """Versão atual das tabelas informadas (muda a cada escrita nelas)"""
+    with _cache_lock:
+        _check_external_writes()
+        return (_external_version,) + tuple(_versions[t] for t in tables)
+
+def invalidate_cache():
+    """Descarta todo o cache de leitura"""
+    global _external_version
+    with _cache_lock:
+        _cache.clear()
+        _external_version += 1
+
+# Colunas de baixa cardinalidade guardadas como category (códigos + rótulos únicos)
+CATEGORY_COLUMNS = ("status", "priority", "probability", "impact", "category", "sponsor")
+# Inteiros reduzidos ao menor tipo que cabe. Só chaves e flags: colunas de medida
+# (effort, progress) ficam em int64 para não estourar em contas como progress * effort
+COMPACT_INT_COLUMNS = ("id", "project_id", "archived")
+
+def compact_frame(df):
+    """Tipos compactos in-place: CATEGORY_COLUMNS como category e COMPACT_INT_COLUMNS no menor inteiro"""
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            continue
+        if col in CATEGORY_COLUMNS and (dtype == object or pd.api.types.is_string_dtype(dtype)):
+            df[col] = df[col].astype("category")
+        elif col in COMPACT_INT_COLUMNS and pd.api.types.is_integer_dtype(dtype) and dtype.itemsize > 1:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+def frame_memory(frames):
+    """Bytes ocupados pelos DataFrames (incluindo textos)"""
+    return int(sum(df.memory_usage(deep=True).sum() for df in frames if isinstance(df, pd.DataFrame)))
+
+def cache_memory():
+    """Entradas e MB do cache de leitura compartilhado"""
+    frames = [df for _, df in _cache.values()]
+    return {'entries': len(frames), 'mb': round(frame_memory(frames) / 2**20, 2)}
+
+def cached_query(query, params=(), tables=TABLES, parse_dates=(), compact=False):
+    """
+    run_query com cache compartilhado. A entrada é reaproveitada enquanto a
+    versão das `tables` lidas pela query não mudar.
+    O DataFrame retornado é compartilhado: não altere in-place (use .assign ou .copy()).
+    compact: aplica compact_frame (category / inteiros menores) antes de guardar.
+    """
+    key = (query, tuple(sorted(params.items())) if isinstance(params, dict) else tuple(params), tuple(parse_dates), compact)
+    with profiling.span("db.cache", sql=_sql_label(query)) as sp:
+        version = table_version(*tables)
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == version:
+            sp['hit'] = True
+            return hit[1]
+        sp['hit'] = False
+        df = run_query(query, params, parse_dates=parse_dates)
+        if compact:
+            df = compact_frame(df)
+        _cache.put(key, (version, df))
+        return df
+
+def load_table(name):
+    """SELECT * de uma tabela, relido apenas quando ela foi alterada"""
+    if name not in _versions:
+        raise ValueError(f"Tabela desconhecida: {name}")
+    return cached_query(f"SELECT * FROM {name}", tables=(name,), parse_dates=DATE_COLUMNS.get(name, ()), compact=True)
+
+# =========================================================
+# CARGA CONCORRENTE (várias consultas independentes de uma vez)
+# =========================================================
+# O SQLite libera o GIL durante a consulta; cada consulta usa uma conexão emprestada do pool do processo
+PREFETCH_WORKERS = int(os.environ.get("GESTAO_PREFETCH_WORKERS", "4"))
+
+_prefetch = {'pool': None}
+_prefetch_lock = threading.Lock()
+
+def _prefetch_pool():
+    with _prefetch_lock:
+        if _prefetch['pool'] is None:
+            _prefetch['pool'] = ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="db-prefetch")
+        return _prefetch['pool']
+
+def prefetch(loaders):
+    """
+    Executa {nome: função sem argumentos} em paralelo e devolve {nome: resultado}.
+    O tempo total é o da consulta mais lenta, não a soma. Erros sobem ao chamador.
+    """
+    if len(loaders) <= 1 or PREFETCH_WORKERS <= 1:
+        return {name: fn() for name, fn in loaders.items()}
+    pool = _prefetch_pool()
+    futures = {name: pool.submit(profiling.bind(fn)) for name, fn in loaders.items()}
+    return {name: fut.result() for name, fut in futures.items()}
+
+# =========================================================
+# CONSULTAS POR PROJETO (índices por project_id)
+# =========================================================
+def fetch_project_risks(project_id):
+    """Riscos de um projeto"""
+    return cached_query("SELECT * FROM risks WHERE project_id = ? ORDER BY id", (int(project_id),), tables=("risks",), compact=True)
+
+def fetch_project_notes(project_id):
+    """Docs & Gaps de um projeto"""
+    return cached_query("SELECT * FROM project_notes WHERE project_id = ? ORDER BY id", (int(project_id),), tables=("project_notes",), parse_dates=DATE_COLUMNS["project_notes"], compact=True)
+
+# =========================================================
+# RESUMO POR PROJETO (project_summary)
+# =========================================================
+_SUMMARY_SOURCES = ("projects", "tasks", "risks", "project_notes")
+
+def load_project_summary(sponsor=None):
+    """
+    Projetos ativos + colunas agregadas de project_summary (0 se sem tarefas/riscos/notas).
+    sponsor: só os projetos da área (sponsor vazio conta como 'Geral').
+    """
+    cols = ", ".join(f"COALESCE(s.{c}, 0) AS {c}" for c in SUMMARY_COLUMNS)
+    return cached_query(f"""
+        SELECT p.*, {cols}
+        FROM projects p LEFT JOIN project_summary s ON s.project_id = p.id
+        WHERE p.archived = 0 AND (:sponsor IS NULL OR COALESCE(NULLIF(p.sponsor, ''), 'Geral') = :sponsor)
+    """, {'sponsor': sponsor}, tables=_SUMMARY_SOURCES, parse_dates=DATE_COLUMNS["projects"])
+
+def fetch_active_task_dates(sponsor=None):
+    """Status e prazo das tarefas de projetos ativos, com a área do projeto (para atrasos por área)"""
+    return cached_query("""
+        SELECT t.project_id, t.status, t.end_date, COALESCE(NULLIF(p.sponsor, ''), 'Geral') AS sponsor
+        FROM tasks t JOIN projects p ON p.id = t.project_id
+        WHERE p.archived = 0 AND (:sponsor IS NULL OR COALESCE(NULLIF(p.sponsor, ''), 'Geral') = :sponsor)
+    """, {'sponsor': sponsor}, tables=("projects", "tasks"), parse_dates=("end_date",))
+
+def rebuild_project_summary():
+    """Recalcula project_summary do zero; retorna o nº de projetos resumidos"""
+    def apply(conn):
+        conn.execute("DELETE FROM project_summary")
+        conn.execute(f"INSERT INTO project_summary (project_id, {', '.join(SUMMARY_COLUMNS)}) {_summary_select_sql()}")
+        return conn.execute("SELECT COUNT(*) FROM project_summary").fetchone()[0]
+    n = _write(apply)
+    _bump_versions(_SUMMARY_SOURCES)
+    return n
+
+def check_project_summary():
+    """IDs de projetos cujo resumo materializado diverge do recálculo completo"""
+    diff = " OR ".join(f"ABS(COALESCE(s.{c}, 0) - COALESCE(f.{c}, 0)) > 1e-6" for c in SUMMARY_COLUMNS)
+    df = run_query(f"""
+        WITH f AS ({_summary_select_sql()})
+        SELECT f.project_id FROM f LEFT JOIN project_summary s ON s.project_id = f.project_id WHERE {diff}
+        UNION
+        SELECT s.project_id FROM project_summary s LEFT JOIN f ON f.project_id = s.project_id WHERE {diff}
+    """)
+    return sorted(df['project_id'].tolist()) if not df.empty else []
+
+# =========================================================
+# PAGINAÇÃO (LIMIT/OFFSET) E CONTAGENS PARA AS LISTAS DA TELA
+# =========================================================
+PAGE_SIZE = 20
+
+def _page(query, params, table, limit, offset):
+    return cached_query(f"{query} ORDER BY id LIMIT ? OFFSET ?", tuple(params) + (int(limit), int(offset)),
+                        tables=(table,), parse_dates=DATE_COLUMNS.get(table, ()))
+
+def _count(query, params, table):
+    df = cached_query(query, params, tables=(table,))
+    return int(df.iloc[0, 0]) if not df.empty else 0
+
+def count_project_tasks_by_status(project_id):
+    """Quantidade de tarefas do projeto por status (colunas do Kanban)"""
+    df = cached_query("SELECT status, COUNT(*) AS total FROM tasks WHERE project_id = ? GROUP BY status", (int(project_id),), tables=("tasks",))
+    return dict(zip(df['status'], df['total'].astype(int))) if not df.empty else {}
+
+def fetch_project_tasks_page(project_id, status, limit=PAGE_SIZE, offset=0):
+    """Uma página das tarefas do projeto com o status informado"""
+    return _page("SELECT * FROM tasks WHERE project_id = ? AND status = ?", (int(project_id), status), "tasks", limit, offset)
+
+def fetch_project_risks_page(project_id, limit=PAGE_SIZE, offset=0):
+    """Uma página dos riscos do projeto"""
+    return _page("SELECT * FROM risks WHERE project_id = ?", (int(project_id),), "risks", limit, offset)
+
+def count_project_notes(project_id):
+    return _count("SELECT COUNT(*) FROM project_notes WHERE project_id = ?", (int(project_id),), "project_notes")
+
+def fetch_project_notes_page(project_id, limit=PAGE_SIZE, offset=0):
+    """Uma página de Docs & Gaps do projeto"""
+    return _page("SELECT * FROM project_notes WHERE project_id = ?", (int(project_id),), "project_notes", limit, offset)
+
+def count_archived_projects():
+    return _count("SELECT COUNT(*) FROM projects WHERE archived = 1", (), "projects")
+
+def fetch_archived_projects_page(limit=PAGE_SIZE, offset=0):
+    """Uma página da galeria de projetos arquivados"""
+    return _page("SELECT * FROM projects WHERE archived = 1", (), "projects", limit, offset)
+
+# =========================================================
+# GANTT (janela de datas e nível de detalhe no SQL)
+# =========================================================
+_GANTT_TASKS_SQL = """
+    SELECT t.id, t.project_id, p.name, t.title, t.start_date, t.end_date, t.status
+    FROM tasks t JOIN projects p ON p.id = t.project_id
+    WHERE p.archived = 0 AND t.start_date IS NOT NULL AND t.end_date IS NOT NULL
+      AND (:project_id IS NULL OR t.project_id = :project_id)
+      AND (:start IS NULL OR t.end_date >= :start)
+      AND (:end IS NULL OR t.start_date <= :end)
+"""
+
+def _gantt_params(start, end, project_id=None, limit=None):
+    return {
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'project_id': int(project_id) if project_id is not None else None,
+        'limit': -1 if limit is None else int(limit),
+    }
+
+def count_gantt_tasks(start=None, end=None, project_id=None):
+    """Quantas tarefas de projetos ativos cruzam a janela [start, end]"""
+    df = cached_query(f"SELECT COUNT(*) AS total FROM ({_GANTT_TASKS_SQL})", _gantt_params(start, end, project_id), tables=("projects", "tasks"))
+    return int(df['total'].iloc[0]) if not df.empty else 0
+
+def fetch_gantt_tasks(start=None, end=None, project_id=None, limit=None):
+    """Barras por tarefa (detalhe) dentro da janela, limitadas a `limit` linhas"""
+    return cached_query(f"{_GANTT_TASKS_SQL} ORDER BY t.project_id, t.start_date LIMIT :limit",
+                        _gantt_params(start, end, project_id, limit), tables=("projects", "tasks"),
+                        parse_dates=("start_date", "end_date"))
+
+def fetch_gantt_projects(start=None, end=None, limit=None):
+    """
+    Uma barra por projeto (visão agregada): menor início, maior fim e status
+    predominante das tarefas que cruzam a janela.
+    """
+    return cached_query(f"""
+        WITH t AS ({_GANTT_TASKS_SQL}),
+        s AS (
+            SELECT project_id, status,
+                   ROW_NUMBER() OVER (PARTITION BY project_id ORDER BY COUNT(*) DESC, status) AS rn
+            FROM t GROUP BY project_id, status
+        )
+        SELECT t.project_id, t.name, MIN(t.start_date) AS start_date, MAX(t.end_date) AS end_date,
+               COUNT(*) AS tasks, s.status
+        FROM t JOIN s ON s.project_id = t.project_id AND s.rn = 1
+        GROUP BY t.project_id, t.name, s.status
+        ORDER BY start_date
+        LIMIT :limit
+    """, _gantt_params(start, end, None, limit), tables=("projects", "tasks"), parse_dates=("start_date", "end_date"))
+
+# =========================================================
+# CALENDÁRIO (eventos que cruzam a janela visível)
+# =========================================================
+# Sem uma das datas, o evento ocupa só a outra (mesma regra do calendário). Cada
+# ramo do UNION ALL é uma faixa simples de datas, para o SQLite usar os índices;
+# nas tarefas, CROSS JOIN fixa tasks como tabela externa (varre só a janela)
+_CALENDAR_PROJECTS_SQL = """
+    SELECT id, name, manager, status, start_date, end_date FROM projects
+    WHERE archived = 0 AND end_date >= :start AND start_date <= :end
+    UNION ALL
+    SELECT id, name, manager, status, start_date, end_date FROM projects
+    WHERE archived = 0 AND end_date IS NULL AND start_date BETWEEN :start AND :end
+    UNION ALL
+    SELECT id, name, manager, status, start_date, end_date FROM projects
+    WHERE archived = 0 AND start_date IS NULL AND end_date BETWEEN :start AND :end
+"""
+_CALENDAR_TASK_COLUMNS = "t.id, t.project_id, p.name, t.title, t.owner, t.status, t.start_date, t.end_date"
+_CALENDAR_TASKS_SQL = f"""
+    SELECT {_CALENDAR_TASK_COLUMNS} FROM tasks t CROSS JOIN projects p
+    WHERE p.id = t.project_id AND p.archived = 0
+      AND t.end_date >= :start AND (t.start_date <= :end OR (t.start_date IS NULL AND t.end_date <= :end))
+    UNION ALL
+    SELECT {_CALENDAR_TASK_COLUMNS} FROM tasks t CROSS JOIN projects p
+    WHERE p.id = t.project_id AND p.archived = 0
+      AND t.end_date IS NULL AND t.start_date BETWEEN :start AND :end
+"""
+
+def _window_params(start, end, limit=None):
+    return {'start': start.isoformat(), 'end': end.isoformat(), 'limit': -1 if limit is None else int(limit)}
+
+def fetch_calendar_projects(start, end):
+    """Projetos ativos cujo período cruza [start, end]"""
+    return cached_query(f"{_CALENDAR_PROJECTS_SQL} ORDER BY start_date, id", _window_params(start, end),
+                        tables=("projects",), parse_dates=DATE_COLUMNS["projects"], compact=True)
+
+def count_calendar_tasks(start, end):
+    df = cached_query(f"SELECT COUNT(*) AS total FROM ({_CALENDAR_TASKS_SQL})", _window_params(start, end), tables=("projects", "tasks"))
+    return int(df['total'].iloc[0]) if not df.empty else 0
+
+def fetch_calendar_tasks(start, end, limit=None):
+    """Tarefas de projetos ativos que cruzam [start, end], pelas entregas mais próximas do início da janela"""
+    return cached_query(f"SELECT * FROM ({_CALENDAR_TASKS_SQL}) ORDER BY COALESCE(end_date, start_date), id LIMIT :limit",
+                        _window_params(start, end, limit),
+                        tables=("projects", "tasks"), parse_dates=DATE_COLUMNS["tasks"], compact=True)
+
+def count_project_milestones(start, end):
+    """Inícios e entregas de projetos ativos dentro de [start, end] (cards do mês na Agenda)"""
+    df = cached_query("""
+        SELECT (SELECT COUNT(*) FROM projects WHERE archived = 0 AND start_date BETWEEN :start AND :end) AS starts,
+               (SELECT COUNT(*) FROM projects WHERE archived = 0 AND end_date BETWEEN :start AND :end) AS ends
+    """, _window_params(start, end), tables=("projects",))
+    return {'starts': int(df['starts'].iloc[0]), 'ends': int(df['ends'].iloc[0])} if not df.empty else {'starts': 0, 'ends': 0}
+
+def fetch_upcoming_deliveries(limit=5):
+    """Próximas entregas (projetos ativos não concluídos, pela data fim)"""
+    return cached_query("""
+        SELECT id, name, manager, status, end_date FROM projects
+        WHERE archived = 0 AND end_date IS NOT NULL AND COALESCE(status, '') <> 'Concluído'
+        ORDER BY end_date, id LIMIT ?
+    """, (int(limit),), tables=("projects",), parse_dates=("end_date",))
+
+# =========================================================
+# AGREGAÇÕES NO SQL (KPIs do Dashboard sem carregar as tabelas)
+# =========================================================
+# Mesmas regras de logic.calculate_delays / compute_health_frame
+_ACTIVE_PROJECTS_SQL = """
+    SELECT id, status, end_date FROM projects
+    WHERE archived = 0 AND (:sponsor IS NULL OR COALESCE(NULLIF(sponsor, ''), 'Geral') = :sponsor)
+"""
+_DONE_SQL = "('Feito', 'Concluído', 'Cancelado')"
+
+def _kpi_params(sponsor):
+    return {'sponsor': None if sponsor in (None, "Todos") else sponsor, 'today': date.today().isoformat()}
+
+def dashboard_kpis(sponsor=None):
+    """
+    KPIs do Dashboard calculados no SQLite (GROUP BY/COUNT), filtrados por área.
+    Retorna dict com total, critical, healthy e late_tasks.
+    """
+    health = cached_query(f"""
+        WITH p AS ({_ACTIVE_PROJECTS_SQL}),
+        r AS (
+            SELECT project_id, MAX(CASE probability WHEN 'Alta' THEN 2 WHEN 'Média' THEN 1 ELSE 0 END) AS lvl
+            FROM risks WHERE project_id IN (SELECT id FROM p) GROUP BY project_id
+        ),
+        g AS (SELECT DISTINCT project_id FROM project_notes WHERE instr(category, 'Gap') > 0),
+        h AS (
+            SELECT CASE WHEN COALESCE(p.status, '') NOT IN {_DONE_SQL} AND date(p.end_date) < :today
+                        THEN CAST(julianday(:today) - julianday(date(p.end_date)) AS INTEGER) ELSE 0 END AS days_late,
+                   COALESCE(r.lvl, 0) AS lvl,
+                   g.project_id IS NOT NULL AS gap
+            FROM p LEFT JOIN r ON r.project_id = p.id LEFT JOIN g ON g.project_id = p.id
+        )
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(days_late > 7 OR lvl = 2 OR gap), 0) AS critical,
+               COALESCE(SUM(days_late = 0 AND lvl = 0 AND NOT gap), 0) AS healthy
+        FROM h
+    """, _kpi_params(sponsor), tables=("projects", "risks", "project_notes"))
+
+    out = {'total': 0, 'critical': 0, 'healthy': 0, 'late_tasks': count_late_tasks(sponsor)}
+    if not health.empty:
+        out.update({k: int(health[k].iloc[0]) for k in ('total', 'critical', 'healthy')})
+    return out
+
+def count_late_tasks(sponsor=None):
+    """Tarefas atrasadas (não concluídas e com fim antes de hoje) de projetos ativos, filtradas por área"""
+    late = cached_query(f"""
+        SELECT COUNT(*) AS late_tasks
+        FROM tasks t JOIN projects p ON p.id = t.project_id
+        WHERE p.archived = 0 AND (:sponsor IS NULL OR COALESCE(NULLIF(p.sponsor, ''), 'Geral') = :sponsor)
+          AND COALESCE(t.status, '') NOT IN {_DONE_SQL} AND date(t.end_date) < :today
+    """, _kpi_params(sponsor), tables=("projects", "tasks"))
+    return int(late['late_tasks'].iloc[0]) if not late.empty else 0
+
+def project_status_counts(sponsor=None):
+    """Quantidade de projetos ativos por status (para o gráfico de pizza)"""
+    return cached_query(f"""
+        WITH p AS ({_ACTIVE_PROJECTS_SQL})
+        SELECT status, COUNT(*) AS total FROM p GROUP BY status
+    """, _kpi_params(sponsor), tables=("projects",))
\ No newline at end of file
@@ -1,14 +1,61 @@
 # utils/logic.py
+import numpy as np
 import pandas as pd
 from datetime import datetime, date
+from . import profiling
+
+DONE_STATUSES = ['Feito', 'Concluído', 'Cancelado']
+RISK_LEVELS = {'Média': 1, 'Alta': 2}
+
+HEALTH_CRITICAL = "🔴 Crítico"
+HEALTH_WARNING = "🟡 Atenção"
+HEALTH_OK = "🟢 Saudável"
+
+def _today(today=None):
+    return pd.Timestamp(today or date.today()).normalize()
+
+# Mesma conversão de texto para data nas versões em lote e escalar
+_DATE_PARSE = {'errors': 'coerce', 'format': 'ISO8601'}
+
+def _dates(col):
+    """Coluna de datas como datetime64 (o loader do db já entrega assim; texto é convertido)"""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    return pd.to_datetime(col, **_DATE_PARSE)
+
+def _day(value):
+    """Versão escalar de _dates, já sem horário (NaT se vazio ou inválido)"""
+    ts = pd.to_datetime(value, **_DATE_PARSE)
+    return ts.normalize() if pd.notna(ts) else pd.NaT
+
+def _is_late(done, end, today):
+    """
+    Regra de atraso (fonte única): não concluída e data fim antes de hoje; sem data fim = no prazo.
+    Vale para Series (calculate_delays) e para escalares (calculate_delay).
+    """
+    return np.logical_not(done) & (end < today)
+
+@profiling.timed()
+def calculate_delays(df, today=None):
+    """
+    Versão por coluna de calculate_delay: Series booleana (Hoje > Data Fim E não concluído).
+    end_date é convertido uma única vez para o frame inteiro; sem data fim = não atrasado.
+    """
+    end = _dates(df['end_date']).dt.normalize()
+    return _is_late(df['status'].isin(DONE_STATUSES), end, _today(today))
+
+@profiling.timed()
+def calculate_days_late(df, today=None):
+    """Dias de atraso por linha (0 se no prazo, concluída ou sem data fim)"""
+    today = _today(today)
+    end = _dates(df['end_date']).dt.normalize()
+    late = _is_late(df['status'].isin(DONE_STATUSES), end, today)
+    return (today - end).dt.days.where(late, 0).fillna(0).astype(int)
 
 def calculate_delay(row):
     """Retorna True se estiver atrasado (Hoje > Data Fim E não concluído)"""
-    if row['status'] in ['Feito', 'Concluído', 'Cancelado']:
-        return False
-    
-    end_date = pd.to_datetime(row['end_date']).date() if isinstance(row['end_date'], str) else row['end_date']
-    return end_date < date.today()
+    # Mesma conversão e regra de calculate_delays, sem montar um DataFrame por chamada
+    return bool(_is_late(row['status'] in DONE_STATUSES, _day(row['end_date']), _today()))
 
 def calculate_project_health(project, tasks_df, risks_df):
     """
@@ -27,11 +74,79 @@ def calculate_project_health(project, tasks_df, risks_df):
     has_high_risk = not proj_risks[proj_risks['probability'] == 'Alta'].empty
     
     if days_late > 7 or has_high_risk:
-        return "🔴 Crítico"
+        return HEALTH_CRITICAL
     elif is_late or not proj_risks[proj_risks['probability'] == 'Média'].empty:
-        return "🟡 Atenção"
+        return HEALTH_WARNING
+    else:
+        return HEALTH_OK
+
+@profiling.timed()
+def build_gap_index(notes_df, project_ids=None):
+    """
+    Mapa project_id -> descrições dos Gaps (impeditivos) pendentes, em uma passada.
+    As chaves são o conjunto de projetos travados: consulta O(1) com `id in gaps`.
+    Se `project_ids` for informado, considera só esses projetos (ex.: ativos).
+    """
+    if notes_df is None or notes_df.empty or 'category' not in notes_df.columns:
+        return {}
+    gaps = notes_df[notes_df['category'].str.contains("Gap", na=False)]
+    if project_ids is not None:
+        gaps = gaps[gaps['project_id'].isin(project_ids)]
+    index = {}
+    for pid, desc in zip(gaps['project_id'].tolist(), gaps['description'].tolist()):
+        index.setdefault(pid, []).append(desc)
+    return index
+
+def gap_project_ids(notes_df):
+    """IDs de projetos com nota da categoria Gap (impeditivo)"""
+    return set(build_gap_index(notes_df))
+
+@profiling.timed()
+def compute_health_frame(projects, risks_df, gaps=None, today=None):
+    """
+    Versão em lote de calculate_project_health + regra de Gap (travado = Crítico).
+    `gaps` pode ser o DataFrame de notas ou o índice de build_gap_index.
+    Retorna DataFrame com o índice de `projects` e as colunas
+    days_late, risk_level (0 nenhum, 1 Média, 2 Alta), has_gap e health.
+    """
+    out = pd.DataFrame(index=projects.index)
+    if projects.empty:
+        return out.assign(days_late=0, risk_level=0, has_gap=False, health=HEALTH_OK)
+
+    out['days_late'] = calculate_days_late(projects, today)
+
+    if risks_df is not None and not risks_df.empty:
+        levels = risks_df['probability'].astype(object).map(RISK_LEVELS).fillna(0)
+        worst = levels.groupby(risks_df['project_id']).max()
+        out['risk_level'] = projects['id'].map(worst).fillna(0).astype(int)
     else:
-        return "🟢 Saudável"
+        out['risk_level'] = 0
+
+    gap_ids = gaps if isinstance(gaps, (dict, set, frozenset)) else gap_project_ids(gaps)
+    out['has_gap'] = projects['id'].isin(list(gap_ids))
+
+    out['health'] = _classify_health(out)
+    return out
+
+def _classify_health(df):
+    critical = (df['days_late'] > 7) | (df['risk_level'] == 2) | df['has_gap']
+    warning = (df['days_late'] > 0) | (df['risk_level'] == 1)
+    return np.select([critical, warning], [HEALTH_CRITICAL, HEALTH_WARNING], HEALTH_OK)
+
+@profiling.timed()
+def compute_health_from_summary(summary, today=None):
+    """
+    Mesmo resultado de compute_health_frame, a partir de db.load_project_summary
+    (contagens de riscos/gaps já agregadas): só o atraso é calculado na hora.
+    """
+    out = pd.DataFrame(index=summary.index)
+    if summary.empty:
+        return out.assign(days_late=0, risk_level=0, has_gap=False, health=HEALTH_OK)
+    out['days_late'] = calculate_days_late(summary, today)
+    out['risk_level'] = np.select([summary['high_risks'] > 0, summary['medium_risks'] > 0], [2, 1], 0)
+    out['has_gap'] = summary['gap_count'] > 0
+    out['health'] = _classify_health(out)
+    return out
 
 def calculate_progress(tasks_df):
     """Média ponderada pelo esforço"""
@@ -42,5 +157,47 @@ def calculate_progress(tasks_df):
     if total_effort == 0:
         return tasks_df['progress'].mean()
         
-    weighted_progress = (tasks_df['progress'] * tasks_df['effort']).sum()
-    return round(weighted_progress / total_effort, 1)
\ No newline at end of file
+    weighted_progress = (tasks_df['progress'].astype('float64') * tasks_df['effort']).sum()
+    return round(weighted_progress / total_effort, 1)
+
+@profiling.timed()
+def compute_progress_frame(projects, tasks_df, today=None):
+    """
+    Versão em lote de calculate_progress + % de tempo decorrido, para todos os projetos.
+    Retorna DataFrame com o índice de `projects` e as colunas progress e time_pct.
+    """
+    out = pd.DataFrame(index=projects.index)
+    if projects.empty:
+        return out.assign(progress=0.0, time_pct=0.0)
+
+    # Avanço físico: média ponderada pelo esforço (média simples se esforço total = 0)
+    if tasks_df is not None and not tasks_df.empty:
+        by_proj = tasks_df.groupby('project_id')
+        effort = by_proj['effort'].sum()
+        # float64: progress * effort não pode estourar mesmo se as colunas vierem em inteiro pequeno
+        weighted = (tasks_df['progress'].astype('float64') * tasks_df['effort']).groupby(tasks_df['project_id']).sum()
+        progress = (weighted / effort.where(effort != 0)).round(1).where(effort != 0, by_proj['progress'].mean())
+        out['progress'] = projects['id'].map(progress).fillna(0)
+    else:
+        out['progress'] = 0.0
+
+    out['time_pct'] = calculate_time_pct(projects, today)
+    return out
+
+@profiling.timed()
+def calculate_time_pct(projects, today=None):
+    """% do prazo já decorrido entre início e fim de cada projeto (0-100)"""
+    start = _dates(projects['start_date'])
+    end = _dates(projects['end_date'])
+    total_days = (end - start).dt.days
+    elapsed = (_today(today) - start).dt.days
+    pct = (elapsed / total_days.where(total_days > 0) * 100).clip(0, 100)
+    return pct.fillna(0)
+
+@profiling.timed()
+def summary_progress(summary):
+    """Avanço ponderado (regra de calculate_progress) a partir das somas de project_summary"""
+    effort = summary['effort_sum']
+    mean = (summary['progress_sum'] / summary['progress_count'].where(summary['progress_count'] > 0)).fillna(0)
+    weighted = (summary['weighted_sum'] / effort.where(effort != 0)).round(1)
+    return weighted.where(effort != 0, mean)
\ No newline at end of file
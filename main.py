@@ -1,78 +1,79 @@
 # app/main.py
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import sys
 import os
-import random
-from datetime import date
+import time
+from datetime import date, timedelta
 from streamlit_calendar import calendar
 from streamlit_option_menu import option_menu
 
 # --- CONFIGURAÇÃO DE PATH ---
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils import db, styles, logic
+from utils import db, styles, logic, charts, profiling, service
+
+_rerun_t0 = time.perf_counter()
+profiling.start_run()
 
 # --- 1. CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(page_title="Gestão de Projetos", page_icon="🚀", layout="wide")
 styles.apply_magalog_style()
 
-# Inicialização DB
-if not os.path.exists("project_management.db"):
-    db.init_db()
-    st.session_state['db_initialized'] = True
-elif 'db_initialized' not in st.session_state:
-    db.init_db()
-    st.session_state['db_initialized'] = True
-
-# --- CARREGAMENTO DE DADOS ---
-df_all_projects = db.run_query("SELECT * FROM projects")
-if df_all_projects.empty or 'id' not in df_all_projects.columns:
-    df_all_projects = pd.DataFrame(columns=['id', 'name', 'code', 'sponsor', 'manager', 'start_date', 'end_date', 'status', 'priority', 'scope', 'results_text', 'archived'])
-
-df_active = df_all_projects[df_all_projects['archived'] == 0].copy()
-df_archived = df_all_projects[df_all_projects['archived'] == 1].copy()
-
-df_tasks = db.run_query("SELECT * FROM tasks")
-df_risks = db.run_query("SELECT * FROM risks")
-df_notes = db.run_query("SELECT * FROM project_notes")
-df_team = db.run_query("SELECT * FROM team_members")
+# Modo de agregação no SQL para os KPIs do Dashboard (GESTAO_SQL_KPIS=1)
+SQL_KPIS = os.environ.get("GESTAO_SQL_KPIS", "0") == "1"
 
-# --- CARREGA ÁREAS DO BANCO (DINÂMICO) ---
-df_sponsors_list = db.run_query("SELECT name FROM sponsors ORDER BY name ASC")
-if not df_sponsors_list.empty:
-    LISTA_AREAS = df_sponsors_list['name'].tolist()
-else:
-    LISTA_AREAS = ["Geral"]
+# Gantt: nível de detalhe e limite de barras (GESTAO_GANTT_DETAIL_MAX / GESTAO_GANTT_MAX_BARS)
+GANTT_MAX_BARS = service.GANTT_MAX_BARS
 
-# --- LÓGICA DE ALERTAS GLOBAIS ---
-projects_at_risk = df_active[df_active['status'] == 'Em Risco']
-
-active_gaps_alert = pd.DataFrame()
-if not df_notes.empty and not df_active.empty:
-    all_gaps = df_notes[df_notes['category'].str.contains("Gap", na=False)]
-    active_gaps_alert = all_gaps[all_gaps['project_id'].isin(df_active['id'])]
-
-def project_has_gap(proj_id):
-    if active_gaps_alert.empty: return False
-    return proj_id in active_gaps_alert['project_id'].values
+# Inicialização DB (schema/seed uma vez por processo; sessões novas só leem)
+db.ensure_db()
 
 def show_project_risk_alert(project_id):
-    status = df_active.loc[df_active['id'] == project_id, 'status'].values[0]
+    status = active_by_id.at[project_id, 'status']
     if status == 'Em Risco':
         st.error("🔥 **ALERTA DE STATUS:** Este projeto está marcado como **'Em Risco'**. O prazo ou escopo podem estar comprometidos.", icon="🔥")
-    if project_has_gap(project_id):
-        gap_desc = active_gaps_alert.loc[active_gaps_alert['project_id'] == project_id, 'description'].values[0]
+    # Páginas sem o índice completo (Tarefas, Riscos, Docs) consultam só as notas do projeto
+    gaps = gap_index if "project_notes" in data else logic.build_gap_index(db.fetch_project_notes(project_id))
+    if project_id in gaps:
+        gap_desc = gaps[project_id][0]
         st.error(f"⛔ **PROJETO TRAVADO (GAP):** Existe um impeditivo pendente: *{gap_desc}*", icon="🛑")
 
-# Mapa de Cores
-COLOR_MAP = {
-    "Concluído": "#22C55E", "Feito": "#22C55E", "🟢 Saudável": "#22C55E",
-    "Em andamento": "#F59E0B", "Fazendo": "#3B82F6", "🟡 Atenção": "#F59E0B",
-    "Em Risco": "#EF4444", "Bloqueado": "#EF4444", "🔴 Crítico": "#EF4444",
-    "Backlog": "#9CA3AF", "A fazer": "#9CA3AF", "Cancelado": "#4B5563"
+def paginator(key, total, page_size=db.PAGE_SIZE):
+    """Seletor de página para listas longas; retorna o offset da página atual"""
+    pages = max(1, -(-total // page_size))
+    if pages == 1:
+        return 0
+    # O valor vive só no session_state (sem value=): semeado na 1ª vez e ajustado se a lista encolheu
+    if key not in st.session_state:
+        st.session_state[key] = 1
+    elif st.session_state[key] > pages:
+        st.session_state[key] = pages
+    page = st.number_input(f"Página (1-{pages})", min_value=1, max_value=pages, step=1, key=key)
+    return (int(page) - 1) * page_size
+
+# --- DADOS POR PÁGINA ---
+# Cada página declara os conjuntos de dados que usa; só esses são carregados (em
+# paralelo) depois que o menu é escolhido. O cache do db relê só tabelas alteradas.
+DATASETS = {
+    "projects": lambda: db.load_table("projects"),
+    "project_notes": lambda: db.load_table("project_notes"),
+    "project_summary": db.load_project_summary,
+    "sponsors": lambda: db.cached_query("SELECT name FROM sponsors ORDER BY name ASC", tables=("sponsors",)),
+    "team_members": lambda: db.load_table("team_members"),
+}
+PAGE_DATA = {
+    "Dashboard Executivo": ("projects", "project_notes", "project_summary", "sponsors"),
+    "Projetos Ativos": ("projects", "project_notes", "sponsors"),
+    "Tarefas": ("projects",),
+    "Cronograma (Gantt)": ("projects", "project_notes"),
+    "Riscos": ("projects",),
+    "Docs & Gaps": ("projects",),
+    "Agenda / Calendário": (),
+    "Histórico / Arquivados": (),
+    # team_members fica fora: a lista da equipe é lida depois do formulário de cadastro
+    "Cadastros & Config": ("sponsors",),
 }
+EMPTY_PROJECTS = pd.DataFrame(columns=['id', 'name', 'code', 'sponsor', 'manager', 'start_date', 'end_date', 'status', 'priority', 'scope', 'results_text', 'archived']).astype({'start_date': 'datetime64[ns]', 'end_date': 'datetime64[ns]'})
 
 # =========================================================
 # SIDEBAR
@@ -115,18 +116,49 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("""<div style="text-align: center; color: rgba(255,255,255,0.7); font-size: 13px; margin-top: 20px;"><p><strong>Desenvolvido por<br>Gabriel Fernandes</strong></p></div>""", unsafe_allow_html=True)
 
+profiling.set_attrs(page=menu)
+
+data = db.prefetch({name: DATASETS[name] for name in PAGE_DATA.get(menu, DATASETS)})
+if profiling.ENABLED:
+    # Memória dos frames usados pela página e do cache compartilhado do processo
+    profiling.set_attrs(data_mb=round(db.frame_memory(data.values()) / 2**20, 3), cache_mb=db.cache_memory()['mb'])
+
+df_all_projects = data.get("projects", EMPTY_PROJECTS)
+if df_all_projects.empty or 'id' not in df_all_projects.columns:
+    df_all_projects = EMPTY_PROJECTS
+df_active = df_all_projects[df_all_projects['archived'] == 0]
+
+# --- CARREGA ÁREAS DO BANCO (DINÂMICO) ---
+df_sponsors_list = data.get("sponsors", pd.DataFrame())
+if not df_sponsors_list.empty:
+    LISTA_AREAS = df_sponsors_list['name'].tolist()
+else:
+    LISTA_AREAS = ["Geral"]
+
+# Tempo até os dados estarem prontos na primeira execução da sessão
+if 'startup_ms' not in st.session_state:
+    st.session_state['startup_ms'] = round((time.perf_counter() - _rerun_t0) * 1000, 2)
+
+# --- LÓGICA DE ALERTAS GLOBAIS ---
+projects_at_risk = df_active[df_active['status'] == 'Em Risco']
+
+# Índice único de Gaps dos projetos ativos: project_id -> descrições (lookup O(1))
+gap_index = logic.build_gap_index(data["project_notes"], df_active['id']) if "project_notes" in data and not df_active.empty else {}
+gap_count = sum(len(descs) for descs in gap_index.values())
+active_by_id = df_active.set_index('id')
+
 # =========================================================
 # 1. DASHBOARD EXECUTIVO
 # =========================================================
 if menu == "Dashboard Executivo":
-    if not active_gaps_alert.empty:
+    if gap_index:
         with st.container(border=True):
             st.markdown("### ⛔ Painel de Impeditivos (GAPs)")
             st.markdown("<div style='background-color: #FEF2F2; padding: 10px; border-radius: 5px; color: #991B1B; margin-bottom: 10px;'><strong>Atenção:</strong> Os projetos abaixo têm pendências que impedem o progresso e estão contabilizados como <strong>CRÍTICOS</strong>.</div>", unsafe_allow_html=True)
-            for _, row in active_gaps_alert.iterrows():
-                p_name = df_active.loc[df_active['id'] == row['project_id'], 'name'].values[0]
-                p_manager = df_active.loc[df_active['id'] == row['project_id'], 'manager'].values[0]
-                st.error(f"**PROJETO:** {p_name} ({p_manager}) | 🛑 **TRAVA:** {row['description']}", icon="🚫")
+            for proj_id, descs in gap_index.items():
+                p_name, p_manager = active_by_id.at[proj_id, 'name'], active_by_id.at[proj_id, 'manager']
+                for desc in descs:
+                    st.error(f"**PROJETO:** {p_name} ({p_manager}) | 🛑 **TRAVA:** {desc}", icon="🚫")
         st.divider()
 
     if not projects_at_risk.empty:
@@ -134,9 +166,10 @@ if menu == "Dashboard Executivo":
 
     st.title("📊 Dashboard Executivo")
     
-    df_view = df_active.copy()
+    # Projetos ativos + agregados de tarefas/riscos/gaps já materializados (project_summary)
+    df_view = data["project_summary"]
     if not df_view.empty and 'sponsor' in df_view.columns:
-        df_view['sponsor'] = df_view['sponsor'].fillna("Geral").replace("", "Geral")
+        df_view = df_view.assign(sponsor=df_view['sponsor'].fillna("Geral").replace("", "Geral"))
 
     col_f1, col_f2 = st.columns(2)
     with col_f1:
@@ -150,23 +183,19 @@ if menu == "Dashboard Executivo":
 
     total = len(df_view)
     if not df_view.empty:
-        df_view['health'] = df_view.apply(lambda x: logic.calculate_project_health(x, df_tasks[df_tasks['project_id']==x['id']], df_risks), axis=1)
-        def override_health_if_gap(row):
-            if project_has_gap(row['id']):
-                return "🔴 Crítico"
-            return row['health']
-        df_view['health'] = df_view.apply(override_health_if_gap, axis=1)
-        crit = len(df_view[df_view['health'].str.contains("Crítico")])
-        ok = len(df_view[df_view['health'].str.contains("Saudável")])
-    else: crit = 0; ok = 0
-
-    late_count = 0
-    if not df_active.empty and not df_tasks.empty:
-        active_ids = df_active['id'].tolist()
-        active_tasks = df_tasks[df_tasks['project_id'].isin(active_ids)].copy()
-        if not active_tasks.empty:
-            active_tasks['is_late'] = active_tasks.apply(logic.calculate_delay, axis=1)
-            late_count = len(active_tasks[active_tasks['is_late']])
+        # Saúde de todos os projetos em lote (Gap pendente já força Crítico)
+        df_view = df_view.assign(health=logic.compute_health_from_summary(df_view)['health'])
+
+    if SQL_KPIS:
+        kpis = db.dashboard_kpis(f_sponsor)
+        total, crit, ok, late_count = kpis['total'], kpis['critical'], kpis['healthy'], kpis['late_tasks']
+    else:
+        if not df_view.empty:
+            crit = len(df_view[df_view['health'].str.contains("Crítico")])
+            ok = len(df_view[df_view['health'].str.contains("Saudável")])
+        else: crit = 0; ok = 0
+
+        late_count = db.count_late_tasks(f_sponsor)
 
     c1, c2, c3, c4 = st.columns(4)
     with c1: styles.card_component("Projetos Ativos", total, "Em execução", "neutral")
@@ -178,9 +207,10 @@ if menu == "Dashboard Executivo":
     with g1:
         st.markdown('<div class="magalog-card">', unsafe_allow_html=True)
         st.subheader("Status")
-        if not df_view.empty:
-            fig = px.pie(df_view, names='status', hole=0.6, color='status', color_discrete_map=COLOR_MAP)
-            fig.update_layout(showlegend=True, legend=dict(orientation="h", y=-0.2), margin=dict(t=0, b=0, l=0, r=0), height=300)
+        df_status = db.project_status_counts(f_sponsor) if SQL_KPIS else df_view
+        if not df_status.empty:
+            fig = charts.cached_figure("status_pie", (f_sponsor, SQL_KPIS), ("projects",),
+                                       lambda: charts.status_pie(df_status, values='total' if SQL_KPIS else None))
             st.plotly_chart(fig, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -188,26 +218,11 @@ if menu == "Dashboard Executivo":
         st.markdown('<div class="magalog-card">', unsafe_allow_html=True)
         st.subheader("Eficiência: Físico vs Tempo")
         if not df_view.empty:
-            proj_metrics = []
-            today = pd.to_datetime("today")
-            for _, proj in df_view.iterrows():
-                p_tasks = df_tasks[df_tasks['project_id'] == proj['id']]
-                real_progress = logic.calculate_progress(p_tasks)
-                if pd.notnull(proj['start_date']) and pd.notnull(proj['end_date']):
-                    start, end = pd.to_datetime(proj['start_date']), pd.to_datetime(proj['end_date'])
-                    total_days = (end - start).days
-                    elapsed = (today - start).days
-                    time_pct = max(0, min(100, (elapsed / total_days) * 100)) if total_days > 0 else 0
-                else: time_pct = 0
-                proj_metrics.append({"Nome": proj['name'], "Avanço Real (%)": real_progress, "Tempo Decorrido (%)": time_pct, "Saúde": proj['health']})
-            
-            df_m = pd.DataFrame(proj_metrics).sort_values('Avanço Real (%)')
-            if not df_m.empty:
-                fig_combo = go.Figure()
-                fig_combo.add_trace(go.Bar(y=df_m['Nome'], x=df_m['Avanço Real (%)'], name='Entrega Real', orientation='h', marker_color=[COLOR_MAP.get(h, "#ccc") for h in df_m['Saúde']], text=df_m['Avanço Real (%)'].apply(lambda x: f"{x:.0f}%"), textposition='auto'))
-                fig_combo.add_trace(go.Scatter(y=df_m['Nome'], x=df_m['Tempo Decorrido (%)'], name='Tempo Gasto', mode='markers', marker=dict(symbol='line-ns-open', size=30, color='#2E2E2E', line=dict(width=4))))
-                fig_combo.update_layout(height=400, xaxis=dict(range=[0, 105]), legend=dict(orientation="h", y=1.1))
-                st.plotly_chart(fig_combo, use_container_width=True)
+            def build_efficiency():
+                df_m = pd.DataFrame({"Nome": df_view['name'], "Avanço Real (%)": logic.summary_progress(df_view), "Tempo Decorrido (%)": logic.calculate_time_pct(df_view), "Saúde": df_view['health']}).sort_values('Avanço Real (%)')
+                return charts.efficiency_combo(df_m)
+            fig_combo = charts.cached_figure("efficiency", f_sponsor, ("projects", "tasks", "risks", "project_notes"), build_efficiency)
+            st.plotly_chart(fig_combo, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
 # =========================================================
@@ -218,9 +233,11 @@ elif menu == "Projetos Ativos":
     t1, t2 = st.tabs(["Lista", "Novo Projeto"])
     with t1:
         if not df_active.empty:
-            d = df_active.copy()
-            d['gap_indicador'] = d['id'].apply(lambda x: "⛔ TRAVADO" if project_has_gap(x) else "OK")
-            d['status_icon'] = d['status'].apply(lambda x: "🔥" if x == "Em Risco" else "🟢")
+            d = df_active.assign(
+                gap_indicador=df_active['id'].isin(list(gap_index)).map({True: "⛔ TRAVADO", False: "OK"}),
+                status_icon=(df_active['status'] == "Em Risco").map({True: "🔥", False: "🟢"}),
+                end_date=df_active['end_date'].dt.date,
+            )
             
             d_display = d[['status_icon', 'gap_indicador', 'name', 'manager', 'status', 'end_date']].rename(columns={
                 'status_icon': 'Sinal', 'gap_indicador': 'Impeditivo?', 'name': 'Nome do Projeto',
@@ -266,7 +283,13 @@ elif menu == "Tarefas":
         sel_nm = st.selectbox("Selecione o Projeto:", list(opts.keys()))
         sel_id = opts[sel_nm]
         show_project_risk_alert(sel_id)
-        tv = df_tasks[df_tasks['project_id'] == sel_id]
+        # Kanban paginado: cada coluna lê só a sua página (custo ~ PAGE_SIZE, não nº de tarefas)
+        kanban_counts = db.count_project_tasks_by_status(sel_id)
+        def kanban_page(status, key):
+            total = kanban_counts.get(status, 0)
+            st.caption(f"{total} tarefa(s)")
+            offset = paginator(f"pg_{key}_{sel_id}", total)
+            return db.fetch_project_tasks_page(sel_id, status, db.PAGE_SIZE, offset)
         t_tab1, t_tab2 = st.tabs(["📊 Kanban Board", "➕ Nova Tarefa"])
         with t_tab1:
             c1, c2, c3, c4 = st.columns(4)
@@ -274,7 +297,7 @@ elif menu == "Tarefas":
             with c1:
                 st.markdown("### 📝 A fazer")
                 st.markdown("---")
-                for _, t in tv[tv['status'] == "A fazer"].iterrows():
+                for _, t in kanban_page("A fazer", "todo").iterrows():
                     with st.container(border=True):
                         st.markdown(f"**{t['title']}**")
                         st.caption(f"👤 {t['owner']}")
@@ -290,7 +313,7 @@ elif menu == "Tarefas":
             with c2:
                 st.markdown("### 🔨 Fazendo")
                 st.markdown("---")
-                for _, t in tv[tv['status'] == "Fazendo"].iterrows():
+                for _, t in kanban_page("Fazendo", "doing").iterrows():
                     st.warning(f"**{t['title']}**\n\n👤 {t['owner']}", icon="🏗️")
                     with st.expander("⚙️ Ações"):
                          with st.form(f"f2_{t['id']}"):
@@ -303,7 +326,7 @@ elif menu == "Tarefas":
             with c3:
                 st.markdown("### 🚫 Bloqueado")
                 st.markdown("---")
-                for _, t in tv[tv['status'] == "Bloqueado"].iterrows():
+                for _, t in kanban_page("Bloqueado", "blocked").iterrows():
                     st.error(f"**{t['title']}**\n\n🛑 Travado", icon="🚨")
                     with st.expander("🔓 Resolver"):
                          with st.form(f"f3_{t['id']}"):
@@ -315,7 +338,7 @@ elif menu == "Tarefas":
             with c4:
                 st.markdown("### ✅ Feito")
                 st.markdown("---")
-                for _, t in tv[tv['status'] == "Feito"].iterrows():
+                for _, t in kanban_page("Feito", "done").iterrows():
                     st.success(f"**{t['title']}**\n\n🏁 100% Concluído", icon="🎉")
                     with st.expander("Reabrir?"):
                          with st.form(f"f4_{t['id']}"):
@@ -341,12 +364,29 @@ elif menu == "Cronograma (Gantt)":
     st.title("📅 Gantt")
     if not projects_at_risk.empty:
         st.warning(f"🔥 Existem {len(projects_at_risk)} projetos em risco.")
-    if not active_gaps_alert.empty:
-        st.error(f"⛔ Existem {len(active_gaps_alert)} impeditivos (Gaps) travando o cronograma.")
+    if gap_index:
+        st.error(f"⛔ Existem {gap_count} impeditivos (Gaps) travando o cronograma.")
+
+    g1, g2 = st.columns(2)
+    with g1:
+        window = st.date_input("Período", (date.today() - timedelta(days=90), date.today() + timedelta(days=180)))
+    with g2:
+        drill = st.selectbox("Detalhar projeto", ["Todos"] + df_active['name'].tolist())
+    w_start, w_end = (window[0], window[-1]) if window else (None, None)
+
+    # Drill-down: tarefas de um projeto; muitas tarefas: uma barra por projeto (status predominante)
+    drill_id = int(df_active.loc[df_active['name'] == drill, 'id'].iloc[0]) if drill != "Todos" else None
+    g_data = service.gantt_frame(w_start, w_end, drill_id)
+    gantt = g_data['frame']
+    y_col = "title" if drill_id is not None else "name"
+    if g_data['level'] == "projects":
+        st.info(f"{g_data['total_tasks']} tarefas no período: exibindo uma barra por projeto. Use 'Detalhar projeto' para ver as tarefas.")
+    if g_data['truncated']:
+        st.warning(f"Exibindo apenas as primeiras {GANTT_MAX_BARS} barras. Reduza o período para ver o restante.")
 
-    gantt = df_tasks[df_tasks['project_id'].isin(df_active['id'])].merge(df_active[['id','name']], left_on='project_id', right_on='id')
     if not gantt.empty:
-        fig = px.timeline(gantt, x_start="start_date", x_end="end_date", y="name", color="status", color_discrete_map=COLOR_MAP)
+        fig = charts.cached_figure("gantt", (w_start, w_end, drill), ("projects", "tasks"),
+                                   lambda: charts.gantt_timeline(gantt, y_col))
         st.plotly_chart(fig, use_container_width=True)
 
 # =========================================================
@@ -360,23 +400,17 @@ elif menu == "Riscos":
         sel_nm = st.selectbox("Projeto:", list(opts.keys()))
         sel_id = opts[sel_nm]
         show_project_risk_alert(sel_id)
-        rv = df_risks[df_risks['project_id'] == sel_id].copy()
+        rv = db.fetch_project_risks(sel_id)
         if st.session_state['r_view'] == 'matriz':
             if st.button("➕ Novo Risco"): 
                 st.session_state['r_view'] = 'novo'
                 st.rerun()
             if not rv.empty:
                 col_name = 'title' if 'title' in rv.columns else 'description'
-                m = {'Baixa':1,'Baixo':1,'Média':2,'Médio':2,'Alta':3,'Alto':3}
-                rv['px'] = rv['impact'].map(m).fillna(2) + [random.uniform(-0.1,0.1) for _ in range(len(rv))]
-                rv['py'] = rv['probability'].map(m).fillna(2) + [random.uniform(-0.1,0.1) for _ in range(len(rv))]
-                fig = go.Figure()
-                fig.add_vline(x=2.5, line_dash="dash", line_color="#ccc")
-                fig.add_hline(y=2.5, line_dash="dash", line_color="#ccc")
-                fig.add_trace(go.Scatter(x=rv['px'], y=rv['py'], mode='markers', hovertext=rv[col_name], marker=dict(size=20, color='#EF4444')))
-                fig.update_layout(title="Matriz", xaxis=dict(range=[0.5,3.5], tickvals=[1,2,3]), yaxis=dict(range=[0.5,3.5], tickvals=[1,2,3]), height=400, plot_bgcolor='white')
+                fig = charts.cached_figure("risk_matrix", sel_id, ("risks",), lambda: charts.risk_matrix(rv, col_name))
                 st.plotly_chart(fig, use_container_width=True)
-                for _, r in rv.iterrows():
+                offset = paginator(f"pg_risks_{sel_id}", len(rv))
+                for _, r in db.fetch_project_risks_page(sel_id, db.PAGE_SIZE, offset).iterrows():
                     with st.expander(f"{r[col_name]}"):
                         st.write(r.get('mitigation_plan',''))
                         if st.button("Excluir", key=f"dr_{r['id']}"):
@@ -408,7 +442,6 @@ elif menu == "Docs & Gaps":
         sel_nm = st.selectbox("Projeto:", list(opts.keys()))
         sel_id = opts[sel_nm]
         show_project_risk_alert(sel_id)
-        nv = df_notes[df_notes['project_id'] == sel_id]
         with st.form("ngap"):
             d = st.text_area("Descrição")
             t = st.radio("Tipo", ["Gap", "Link"])
@@ -416,7 +449,8 @@ elif menu == "Docs & Gaps":
                 db.execute_command("INSERT INTO project_notes (project_id, category, description, created_at) VALUES (?,?,?,?)", (sel_id, t, d, date.today()))
                 st.rerun()
         st.divider()
-        for _, n in nv.iterrows():
+        offset = paginator(f"pg_notes_{sel_id}", db.count_project_notes(sel_id))
+        for _, n in db.fetch_project_notes_page(sel_id, db.PAGE_SIZE, offset).iterrows():
             st.write(f"**{n['category']}**: {n['description']}")
             if st.button("x", key=f"dn_{n['id']}"):
                 db.execute_command("DELETE FROM project_notes WHERE id=?", (n['id'],))
@@ -427,33 +461,35 @@ elif menu == "Docs & Gaps":
 # =========================================================
 elif menu == "Agenda / Calendário":
     st.title("📆 Agenda & Cronograma de Implantação")
-    cal_colors = {"Em andamento": "#3B82F6", "Em Risco": "#EF4444", "Concluído": "#10B981", "Backlog": "#6B7280"}
-    events = []
-    for _, row in df_active.iterrows():
-        bg_color = cal_colors.get(row['status'], "#3788d8")
-        event = {"title": f"{row['name']} ({row['manager']})", "start": str(row['start_date']), "end": str(row['end_date']), "backgroundColor": bg_color, "borderColor": bg_color, "allDay": True}
-        events.append(event)
-    calendar_options = {"headerToolbar": {"left": "today prev,next", "center": "title", "right": "dayGridMonth,timeGridWeek,listMonth"}, "initialView": "dayGridMonth", "navLinks": True, "selectable": True, "editable": False}
+    # Mês exibido fica na sessão; só os eventos da grade desse mês vão para o navegador
+    if 'cal_month' not in st.session_state: st.session_state['cal_month'] = date.today().replace(day=1)
+    n1, n2, n3, n4 = st.columns([1, 1, 1, 2])
+    if n1.button("◀ Mês anterior"): st.session_state['cal_month'] = (st.session_state['cal_month'] - timedelta(days=1)).replace(day=1)
+    if n2.button("Hoje"): st.session_state['cal_month'] = date.today().replace(day=1)
+    if n3.button("Próximo mês ▶"): st.session_state['cal_month'] = (st.session_state['cal_month'] + timedelta(days=32)).replace(day=1)
+    with_tasks = n4.toggle("Mostrar tarefas", value=False)
+    cal_month = st.session_state['cal_month']
+    ag = service.agenda(cal_month, include_tasks=with_tasks)
+    feed = ag['calendar']
+    calendar_options = {"headerToolbar": {"left": "", "center": "title", "right": "dayGridMonth,timeGridWeek,listMonth"}, "initialView": "dayGridMonth", "initialDate": ag['month'], "dayMaxEvents": True, "navLinks": True, "selectable": True, "editable": False}
     
-    today = date.today()
-    this_month_starts = df_active[pd.to_datetime(df_active['start_date']).dt.month == today.month]
-    this_month_ends = df_active[pd.to_datetime(df_active['end_date']).dt.month == today.month]
     m1, m2, m3 = st.columns(3)
-    with m1: st.metric("📅 Mês Atual", today.strftime("%B / %Y"))
-    with m2: st.metric("🚀 Inícios este mês", len(this_month_starts))
-    with m3: st.metric("🏁 Entregas este mês", len(this_month_ends), delta_color="inverse")
+    with m1: st.metric("📅 Mês", cal_month.strftime("%B / %Y"))
+    with m2: st.metric("🚀 Inícios no mês", ag['starts_this_month'])
+    with m3: st.metric("🏁 Entregas no mês", ag['ends_this_month'], delta_color="inverse")
     st.divider()
     col_cal, col_list = st.columns([2, 1])
     with col_cal:
         st.subheader("Visualização Gráfica")
-        calendar(events=events, options=calendar_options, key="my_calendar")
+        if with_tasks and feed['tasks_total'] > feed['tasks_shown']:
+            st.caption(f"Exibindo {feed['tasks_shown']} de {feed['tasks_total']} tarefas do período (as de entrega mais próxima).")
+        calendar(events=feed['events'], options=calendar_options, key=f"my_calendar_{ag['month']}")
         st.markdown("**Legenda:** 🔵 Em andamento | 🔴 Em Risco | 🟢 Concluído | ⚫ Backlog")
     with col_list:
         st.subheader("🔔 Próximas Entregas")
-        upcoming = df_active[df_active['status'] != 'Concluído'].sort_values('end_date').head(5)
-        if not upcoming.empty:
-            for _, proj in upcoming.iterrows():
-                days_left = (pd.to_datetime(proj['end_date']).date() - today).days
+        if ag['upcoming']:
+            for proj in ag['upcoming']:
+                days_left = proj['days_left']
                 if days_left < 0: icon="🚨"; msg=f"Atrasado há {abs(days_left)} dias"; bg="#FEF2F2"
                 elif days_left <= 7: icon="🔥"; msg=f"Vence em {days_left} dias"; bg="#FFF7ED"
                 else: icon="📅"; msg=f"Faltam {days_left} dias"; bg="#F3F4F6"
@@ -466,13 +502,17 @@ elif menu == "Agenda / Calendário":
 elif menu == "Histórico / Arquivados":
     st.title("🏛️ Galeria de Projetos Arquivados")
     st.markdown("Histórico de projetos concluídos ou cancelados. Utilize para registrar **Lições Aprendidas** e **Ganhos**.")
-    if df_archived.empty:
+    archived_total = db.count_archived_projects()
+    if archived_total == 0:
         st.info("Nenhum projeto arquivado ainda.")
     else:
+        offset = paginator("pg_archived", archived_total)
         cols = st.columns(3)
-        for idx, row in df_archived.iterrows():
+        df_page = db.fetch_archived_projects_page(db.PAGE_SIZE, offset)
+        gallery = df_page.assign(end_label=df_page['end_date'].dt.strftime('%Y-%m-%d').fillna(''))
+        for idx, row in gallery.iterrows():
             with cols[idx % 3]:
-                st.markdown(f"""<div style="background-color: white; padding: 20px; border-radius: 10px; border: 1px solid #E5E7EB; box-shadow: 0 4px 6px rgba(0,0,0,0.05); margin-bottom: 20px;"><h3 style="color: #0B2D5C; margin: 0 0 5px 0;">{row['name']}</h3><span style="background-color: #E5E7EB; padding: 2px 8px; border-radius: 10px; font-size: 12px; font-weight: bold; color: #374151;">{row['status']}</span><p style="font-size: 13px; color: #6B7280; margin-top: 10px;">👤 <b>Gerente:</b> {row['manager']}<br>🏁 <b>Fim:</b> {row['end_date']}</p></div>""", unsafe_allow_html=True)
+                st.markdown(f"""<div style="background-color: white; padding: 20px; border-radius: 10px; border: 1px solid #E5E7EB; box-shadow: 0 4px 6px rgba(0,0,0,0.05); margin-bottom: 20px;"><h3 style="color: #0B2D5C; margin: 0 0 5px 0;">{row['name']}</h3><span style="background-color: #E5E7EB; padding: 2px 8px; border-radius: 10px; font-size: 12px; font-weight: bold; color: #374151;">{row['status']}</span><p style="font-size: 13px; color: #6B7280; margin-top: 10px;">👤 <b>Gerente:</b> {row['manager']}<br>🏁 <b>Fim:</b> {row['end_label']}</p></div>""", unsafe_allow_html=True)
                 with st.expander("🏆 Ver Ganhos & Resultados"):
                     with st.form(key=f"results_{row['id']}"):
                         results = st.text_area("Quais foram os ganhos/entregáveis?", value=row['results_text'] if row['results_text'] else "", height=100)
@@ -488,7 +528,7 @@ elif menu == "Histórico / Arquivados":
 elif menu == "Cadastros & Config":
     st.title("⚙️Cadastros & Configurações")
     
-    tab_team, tab_areas, tab_db = st.tabs(["👥 Gerenciar Equipe", "🏢 Gerenciar Áreas", "⚠️ Sistema"])
+    tab_team, tab_areas, tab_perf, tab_db = st.tabs(["👥 Gerenciar Equipe", "🏢 Gerenciar Áreas", "📈 Desempenho", "⚠️ Sistema"])
     
     # --- ABA EQUIPE ---
     with tab_team:
@@ -512,6 +552,7 @@ elif menu == "Cadastros & Config":
         
         st.divider()
         st.markdown("### 📇 Lista de Contatos")
+        df_team = db.load_table("team_members")  # lido aqui: um cadastro acima já aparece na lista
         if not df_team.empty:
             st.dataframe(df_team[['name', 'role', 'area', 'email', 'phone']].rename(columns={'name': 'Nome', 'role': 'Cargo', 'area': 'Área', 'email': 'Email', 'phone': 'Telefone'}), hide_index=True, use_container_width=True)
             with st.expander("🗑️ Excluir Membro"):
@@ -540,12 +581,57 @@ elif menu == "Cadastros & Config":
                 if st.form_submit_button("Excluir"):
                     if del_area: db.execute_command("DELETE FROM sponsors WHERE name=?", (del_area,)); st.success(f"Área '{del_area}' removida!"); st.rerun()
 
+    # --- ABA DESEMPENHO ---
+    with tab_perf:
+        st.subheader("📈 Tempo por Execução")
+        st.caption("Mede cada rerun: consultas ao banco, cache, funções de cálculo e gráficos. Também ativável com GESTAO_PROFILE=1.")
+        perf_on = st.toggle("Coletar métricas", value=profiling.ENABLED)
+        if perf_on != profiling.ENABLED:
+            profiling.enable(perf_on)
+            st.rerun()
+        runs = profiling.recent_runs()
+        if runs:
+            df_runs = pd.DataFrame([{k: r.get(k) for k in ('started_at', 'page', 'total_ms', 'queries', 'db_ms', 'data_mb', 'cache_mb')} for r in runs]).iloc[::-1]
+            st.dataframe(df_runs.rename(columns={'started_at': 'Início', 'page': 'Página', 'total_ms': 'Total (ms)', 'queries': 'Consultas', 'db_ms': 'Banco (ms)', 'data_mb': 'Dados da página (MB)', 'cache_mb': 'Cache (MB)'}), hide_index=True, use_container_width=True)
+            df_spans = pd.DataFrame([{**sp, 'page': r.get('page')} for r in runs for sp in r['spans']])
+            if not df_spans.empty:
+                st.markdown("**Trechos mais lentos**")
+                agg = df_spans.groupby('name')['ms'].agg(['count', 'mean', 'max', 'sum']).sort_values('sum', ascending=False).round(2).reset_index()
+                st.dataframe(agg.rename(columns={'name': 'Trecho', 'count': 'Chamadas', 'mean': 'Média (ms)', 'max': 'Máx (ms)', 'sum': 'Total (ms)'}), hide_index=True, use_container_width=True)
+                if 'sql' in df_spans.columns:
+                    slow_sql = df_spans[df_spans['name'] == 'db.query'].nlargest(10, 'ms')[['page', 'sql', 'ms']]
+                    st.markdown("**Consultas mais lentas**")
+                    st.dataframe(slow_sql.rename(columns={'page': 'Página', 'sql': 'SQL', 'ms': 'ms'}), hide_index=True, use_container_width=True)
+            st.download_button("Baixar runs (JSON Lines)", profiling.to_jsonl(runs), file_name="profiling.jsonl", mime="application/json")
+        elif profiling.ENABLED:
+            st.info("Navegue pelas páginas para registrar execuções.")
+        else:
+            st.info("Coleta desligada.")
+
     # --- ABA SISTEMA ---
     with tab_db:
+        st.subheader("⏱️ Inicialização")
+        startup = db.startup_report()
+        startup['session_first_load_ms'] = st.session_state.get('startup_ms')
+        st.json(startup)
+        st.divider()
+        st.subheader("🔒 Concorrência de Escrita")
+        st.caption(f"Escritas serializadas neste processo; espera de até {db.BUSY_TIMEOUT_MS} ms pelo lock do arquivo e até {db.LOCK_RETRIES} novas tentativas.")
+        st.json(db.contention_stats())
+        st.divider()
+        st.subheader("🧮 Resumo por Projeto")
+        st.caption("Confere o resumo materializado (project_summary) contra as tabelas e recalcula do zero.")
+        if st.button("Conferir e Recalcular Resumo"):
+            divergent = db.check_project_summary()
+            n = db.rebuild_project_summary()
+            st.success(f"Resumo recalculado para {n} projetos. Divergências encontradas antes: {len(divergent)}.")
+        st.divider()
         st.subheader("Zona de Perigo")
         st.warning("Cuidado: A ação abaixo apaga TODOS os dados do sistema.")
         if st.button("Reset DB (Apagar Tudo)"):
-            if os.path.exists("project_management.db"):
-                os.remove("project_management.db")
+            if os.path.exists(db.DB_PATH):
+                db.reset_db()
                 for key in list(st.session_state.keys()): del st.session_state[key]
-                st.rerun()
\ No newline at end of file
+                st.rerun()
+
+profiling.end_run()
\ No newline at end of file
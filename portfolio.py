@@ -0,0 +1,202 @@
+# utils/portfolio.py
+# Relatório de portfólio: o Dashboard Executivo de todas as áreas de uma vez.
+# Os projetos são particionados por sponsor e cada área é calculada num processo
+# separado (logic.*). Os dados vão para os workers como arquivos Arrow mapeados em
+# memória (somente leitura, sem pickle de DataFrames); sem pyarrow, cada worker lê
+# a própria área direto do SQLite.
+#
+#   python -m utils.portfolio --out portfolio.json
+#   python -m utils.portfolio --workers 8 --area TI --area RH
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+import multiprocessing as mp
+import pandas as pd
+from . import db, logic
+
+SHARED_MODES = ("auto", "arrow", "sqlite")
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+    except ImportError:
+        return None
+    return pyarrow
+
+def _normalize_sponsor(col):
+    return col.fillna("Geral").replace("", "Geral").astype(str)
+
+def default_areas(summary=None):
+    """Áreas cadastradas + sponsors em uso por projetos ativos (mesma lista do filtro do Dashboard)"""
+    areas = set(db.cached_query("SELECT name FROM sponsors", tables=("sponsors",))['name'].dropna())
+    if summary is None:
+        summary = db.load_project_summary()
+    if not summary.empty:
+        areas |= set(_normalize_sponsor(summary['sponsor']))
+    return sorted(areas)
+
+# =========================================================
+# MÉTRICAS DE UMA ÁREA
+# =========================================================
+def area_metrics(area, summary, tasks, today=None, efficiency=True):
+    """
+    KPIs do Dashboard Executivo para os projetos de uma área.
+    summary: linhas de db.load_project_summary; tasks: status/end_date das tarefas desses projetos.
+    """
+    out = {'area': area, 'total': len(summary), 'critical': 0, 'warning': 0, 'healthy': 0,
+           'late_tasks': int(logic.calculate_delays(tasks, today).sum()) if not tasks.empty else 0,
+           'status_counts': {}}
+    if efficiency:
+        out['efficiency'] = []
+    if summary.empty:
+        return out
+    health = logic.compute_health_from_summary(summary, today)['health']
+    out['critical'] = int((health == logic.HEALTH_CRITICAL).sum())
+    out['warning'] = int((health == logic.HEALTH_WARNING).sum())
+    out['healthy'] = int((health == logic.HEALTH_OK).sum())
+    out['status_counts'] = {str(k): int(v) for k, v in summary['status'].value_counts().items()}
+    if efficiency:
+        eff = pd.DataFrame({
+            'project_id': summary['id'].astype(int),
+            'name': summary['name'],
+            'progress': logic.summary_progress(summary),
+            'time_pct': logic.calculate_time_pct(summary, today).round(1),
+            'health': health,
+        }).sort_values('progress')
+        out['efficiency'] = eff.to_dict('records')
+    return out
+
+# =========================================================
+# WORKERS
+# =========================================================
+# Estado de cada processo do pool, preenchido pelo initializer
+_shared = {}
+
+def _init_worker(mode, source, offsets, today, efficiency):
+    _shared.update(mode=mode, offsets=offsets, today=today, efficiency=efficiency)
+    if mode == "arrow":
+        pa = _pyarrow()
+        # read_all sobre memory_map não copia: as colunas apontam para o arquivo mapeado
+        _shared['tables'] = {name: pa.ipc.open_file(pa.memory_map(path)).read_all() for name, path in source.items()}
+    else:
+        db.DB_PATH = source
+
+def _partition(name, area):
+    start, stop = _shared['offsets'][name].get(area, (0, 0))
+    return _shared['tables'][name].slice(start, stop - start).to_pandas()
+
+def _area_report(area):
+    if _shared['mode'] == "arrow":
+        summary, tasks = _partition('summary', area), _partition('tasks', area)
+    else:
+        summary, tasks = db.load_project_summary(area), db.fetch_active_task_dates(area)
+    return area_metrics(area, summary, tasks, _shared['today'], _shared['efficiency'])
+
+def _with_area(df):
+    return df.assign(sponsor=_normalize_sponsor(df['sponsor']))
+
+def _sorted_by_sponsor(df):
+    return _with_area(df).sort_values('sponsor', kind='stable').reset_index(drop=True)
+
+def _offsets(sponsors):
+    """{área: (início, fim)} das linhas de cada área num frame ordenado por sponsor"""
+    starts = sponsors[~sponsors.duplicated()]
+    stops = list(starts.index[1:]) + [len(sponsors)]
+    return {area: (int(i), int(j)) for (i, area), j in zip(starts.items(), stops)}
+
+def _write_shared(tmpdir, frames):
+    pa = _pyarrow()
+    paths = {}
+    for name, df in frames.items():
+        paths[name] = os.path.join(tmpdir, f"{name}.arrow")
+        # Sem compressão: o arquivo precisa ser mapeável direto em memória
+        pa.feather.write_feather(df, paths[name], compression="uncompressed")
+    return paths
+
+# =========================================================
+# RELATÓRIO
+# =========================================================
+def _merge(results):
+    status = Counter()
+    totals = {'total': 0, 'critical': 0, 'warning': 0, 'healthy': 0, 'late_tasks': 0}
+    for r in results:
+        for k in totals:
+            totals[k] += r[k]
+        status.update(r['status_counts'])
+    totals['status_counts'] = dict(status)
+    return totals
+
+def build_portfolio(areas=None, workers=None, shared="auto", today=None, efficiency=True):
+    """
+    Métricas do Dashboard Executivo (saúde, tarefas atrasadas, eficiência) por área.
+    workers: processos do pool (padrão: todos os núcleos; 1 = sem pool, no próprio processo).
+    shared: 'arrow' (arquivos mapeados em memória), 'sqlite' (cada worker lê sua área) ou 'auto'.
+    """
+    if shared not in SHARED_MODES:
+        raise ValueError(f"shared deve ser um de {', '.join(SHARED_MODES)}")
+    if shared == "auto":
+        shared = "arrow" if _pyarrow() is not None else "sqlite"
+    elif shared == "arrow" and _pyarrow() is None:
+        raise ImportError("O modo arrow exige o pacote pyarrow (pip install pyarrow)")
+    today = (pd.Timestamp(today) if today else pd.Timestamp(date.today())).date().isoformat()
+
+    db.ensure_db()
+    summary = db.load_project_summary()
+    areas = list(areas) if areas else default_areas(summary)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(areas) or 1))
+    report = {'generated_at': datetime.now().isoformat(timespec='seconds'), 'today': today,
+              'db': os.path.abspath(db.DB_PATH), 'workers': workers, 'shared': shared}
+
+    if workers == 1:
+        report['shared'] = "none"
+        summary, tasks = _with_area(summary), _with_area(db.fetch_active_task_dates())
+        results = [area_metrics(a, summary[summary['sponsor'] == a], tasks[tasks['sponsor'] == a], today, efficiency)
+                   for a in areas]
+    else:
+        chunksize = max(1, len(areas) // (workers * 4))
+        # spawn: processos limpos (sem conexões SQLite herdadas) e igual no Windows
+        ctx = mp.get_context("spawn")
+        with tempfile.TemporaryDirectory(prefix="gp_portfolio_") as tmpdir:
+            if shared == "arrow":
+                frames = {'summary': _sorted_by_sponsor(summary), 'tasks': _sorted_by_sponsor(db.fetch_active_task_dates())}
+                offsets = {name: _offsets(df['sponsor']) for name, df in frames.items()}
+                source = _write_shared(tmpdir, frames)
+                del frames
+            else:
+                offsets, source = {}, os.path.abspath(db.DB_PATH)
+            with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(shared, source, offsets, today, efficiency)) as pool:
+                results = list(pool.map(_area_report, areas, chunksize=chunksize))
+
+    report['areas'] = results
+    report['totals'] = _merge(results)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Relatório de portfólio (Dashboard Executivo por área)")
+    parser.add_argument("--db", default=db.DB_PATH, help="Arquivo SQLite (padrão: %(default)s)")
+    parser.add_argument("--area", action="append", help="Área a incluir (repetível). Padrão: todas")
+    parser.add_argument("--workers", type=int, default=None, help="Processos (padrão: nº de núcleos)")
+    parser.add_argument("--shared", choices=SHARED_MODES, default="auto", help="Como os workers recebem os dados")
+    parser.add_argument("--today", default=None, help="Data de referência AAAA-MM-DD (padrão: hoje)")
+    parser.add_argument("--no-efficiency", action="store_true", help="Omite a série Físico vs Tempo por projeto")
+    parser.add_argument("--out", default=None, help="Arquivo JSON (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    report = build_portfolio(args.area, args.workers, args.shared, args.today, not args.no_efficiency)
+    text = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,123 @@
+# utils/profiling.py
+# Instrumentação opt-in dos caminhos quentes (GESTAO_PROFILE=1 ou painel "Desempenho").
+# Cada execução do main.py abre um "run" na thread da sessão; consultas ao banco,
+# funções de logic e gráficos registram spans nele. Saída: painel admin ou JSON Lines.
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+ENABLED = os.environ.get("GESTAO_PROFILE", "0") == "1"
+LOG_PATH = os.environ.get("GESTAO_PROFILE_LOG")  # se definido, cada run é anexado como JSON Lines
+MAX_RUNS = 50
+
+_local = threading.local()
+_runs = deque(maxlen=MAX_RUNS)
+_runs_lock = threading.Lock()
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+def start_run(**attrs):
+    """Abre a coleta de spans de uma execução (rerun) na thread atual"""
+    if not ENABLED:
+        _local.run = None
+        return
+    _local.run = {'started_at': datetime.now().isoformat(timespec='milliseconds'), 't0': time.perf_counter(),
+                  'spans': [], **attrs}
+
+def set_attrs(**attrs):
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        run.update(attrs)
+
+class _Span(dict):
+    __slots__ = ('_run', '_t0')
+
+    def __init__(self, run, name, attrs):
+        super().__init__(name=name, **attrs)
+        self._run = run
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        self['start_ms'] = round((self._t0 - self._run['t0']) * 1000, 3)
+        return self
+
+    def __exit__(self, *exc):
+        self['ms'] = round((time.perf_counter() - self._t0) * 1000, 3)
+        self._run['spans'].append(dict(self))
+        return False
+
+class _NoSpan(dict):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def span(name, **attrs):
+    """
+    Mede um trecho: `with span("db.query", sql=q) as sp: ...; sp['rows'] = n`.
+    Sem run ativo (ou desabilitado) não registra nada.
+    """
+    run = getattr(_local, 'run', None) if ENABLED else None
+    if run is None:
+        return _NoSpan()
+    return _Span(run, name, attrs)
+
+def bind(fn):
+    """Liga fn ao run da thread atual, para spans registrados em outra thread (pool) entrarem nele"""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        return fn
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, 'run', None)
+        _local.run = run
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.run = previous
+    return wrapper
+
+def timed(name=None):
+    """Decorator: registra um span a cada chamada da função"""
+    def deco(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED or getattr(_local, 'run', None) is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def end_run():
+    """Fecha o run atual, guarda no histórico e (opcional) grava em LOG_PATH"""
+    run = getattr(_local, 'run', None)
+    _local.run = None
+    if run is None:
+        return None
+    run['total_ms'] = round((time.perf_counter() - run.pop('t0')) * 1000, 3)
+    db_spans = [s for s in run['spans'] if s['name'].startswith('db.')]
+    run['queries'] = sum(1 for s in db_spans if s['name'] in ('db.query', 'db.execute'))
+    run['db_ms'] = round(sum(s['ms'] for s in db_spans if s['name'] != 'db.cache'), 3)
+    with _runs_lock:
+        _runs.append(run)
+        if LOG_PATH:
+            with open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(run, ensure_ascii=False, default=str) + "\n")
+    return run
+
+def recent_runs():
+    """Últimos runs registrados neste processo (mais recente por último)"""
+    with _runs_lock:
+        return list(_runs)
+
+def to_jsonl(runs=None):
+    return "\n".join(json.dumps(r, ensure_ascii=False, default=str) for r in (recent_runs() if runs is None else runs))
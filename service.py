@@ -0,0 +1,294 @@
+# utils/service.py
+# Camada de consulta sem Streamlit: Dashboard, Gantt, Riscos e Agenda como funções
+# Python que devolvem dicts/listas prontos para JSON, com cache pela versão dos dados.
+# Opcionalmente servidas por HTTP local (JSON) para ferramentas de BI.
+#
+#   python -m utils.service dashboard --sponsor TI
+#   python -m utils.service serve --port 8765
+#   curl "http://127.0.0.1:8765/gantt?start=2025-01-01&end=2025-06-30"
+import argparse
+import json
+import math
+import os
+import sys
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+from . import db, logic
+from .cache import LRUCache
+from .portfolio import area_metrics
+
+# Gantt: acima de GANTT_DETAIL_MAX tarefas na janela, uma barra por projeto;
+# GANTT_MAX_BARS limita o total de barras devolvidas
+GANTT_DETAIL_MAX = int(os.environ.get("GESTAO_GANTT_DETAIL_MAX", "500"))
+GANTT_MAX_BARS = int(os.environ.get("GESTAO_GANTT_MAX_BARS", "2000"))
+
+CAL_COLORS = {"Em andamento": "#3B82F6", "Em Risco": "#EF4444", "Concluído": "#10B981", "Backlog": "#6B7280"}
+TASK_COLORS = {"A fazer": "#9CA3AF", "Fazendo": "#3B82F6", "Bloqueado": "#EF4444", "Feito": "#10B981"}
+
+# Calendário: tarefas entram como eventos só até este limite por janela
+CALENDAR_MAX_TASKS = int(os.environ.get("GESTAO_CALENDAR_MAX_TASKS", "300"))
+
+# =========================================================
+# CACHE DE RESULTADOS (LRU, compartilhado entre chamadores)
+# =========================================================
+RESULT_CACHE_SIZE = 256
+
+_results = LRUCache(RESULT_CACHE_SIZE)
+_MISSING = object()
+
+def _cached(name, args, tables, build):
+    """Resultado de (name, args, versão das tabelas, hoje) ou build(); não altere o objeto retornado"""
+    key = (name, args, db.table_version(*tables), date.today())
+    result = _results.get(key, _MISSING)
+    if result is _MISSING:
+        result = build()
+        _results.put(key, result)
+    return result
+
+def clear_cache():
+    _results.clear()
+
+def _records(df):
+    """DataFrame -> lista de dicts com datas ISO e None no lugar de NaN/NaT"""
+    out = df.copy()
+    for col in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].dt.strftime('%Y-%m-%d')
+    rows = out.astype(object).where(out.notna(), None).to_dict('records')
+    return [{k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in r.items()} for r in rows]
+
+def _date(value):
+    if value in (None, ""):
+        return None
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+def _sponsor(sponsor):
+    return None if sponsor in (None, "", "Todos") else sponsor
+
+# =========================================================
+# DASHBOARD
+# =========================================================
+def dashboard(sponsor=None, efficiency=True):
+    """KPIs do Dashboard Executivo (saúde, tarefas atrasadas, status, Físico vs Tempo) de uma área ou de todas"""
+    sponsor = _sponsor(sponsor)
+    def build():
+        out = area_metrics(sponsor or "Todos", db.load_project_summary(sponsor), db.fetch_active_task_dates(sponsor),
+                           efficiency=efficiency)
+        out['gaps'] = len(db.cached_query(
+            "SELECT DISTINCT project_id FROM project_notes WHERE instr(category, 'Gap') > 0 AND project_id IN "
+            "(SELECT id FROM projects WHERE archived = 0 AND (:sponsor IS NULL OR COALESCE(NULLIF(sponsor, ''), 'Geral') = :sponsor))",
+            {'sponsor': sponsor}, tables=("projects", "project_notes")))
+        return out
+    return _cached("dashboard", (sponsor, efficiency), ("projects", "tasks", "risks", "project_notes"), build)
+
+# =========================================================
+# GANTT
+# =========================================================
+def gantt_frame(start=None, end=None, project_id=None, detail_max=None, max_bars=None):
+    """
+    Barras do Gantt na janela [start, end] com o mesmo nível de detalhe da tela:
+    tarefas de um projeto (drill-down), tarefas de todos, ou uma barra por projeto
+    quando há mais de detail_max tarefas. Retorna dict com level, total_tasks, truncated e frame.
+    """
+    start, end = _date(start), _date(end)
+    detail_max = GANTT_DETAIL_MAX if detail_max is None else detail_max
+    max_bars = GANTT_MAX_BARS if max_bars is None else max_bars
+    total = db.count_gantt_tasks(start, end, project_id)
+    # Uma linha além do limite: só há corte se ela existir
+    if project_id is None and total > detail_max:
+        level, frame = "projects", db.fetch_gantt_projects(start, end, limit=max_bars + 1)
+    else:
+        level, frame = "tasks", db.fetch_gantt_tasks(start, end, project_id, limit=max_bars + 1)
+    truncated = len(frame) > max_bars
+    return {'level': level, 'total_tasks': total, 'truncated': truncated, 'frame': frame.iloc[:max_bars] if truncated else frame}
+
+def gantt(start=None, end=None, project_id=None, detail_max=None, max_bars=None):
+    """gantt_frame em formato JSON (barras como lista de dicts)"""
+    project_id = int(project_id) if project_id not in (None, "") else None
+    args = (_date(start), _date(end), project_id, detail_max, max_bars)
+    def build():
+        g = gantt_frame(*args)
+        return {'level': g['level'], 'total_tasks': g['total_tasks'], 'truncated': g['truncated'], 'bars': _records(g['frame'])}
+    return _cached("gantt", args, ("projects", "tasks"), build)
+
+# =========================================================
+# RISCOS
+# =========================================================
+def risks(project_id):
+    """Riscos de um projeto com o nível (0-2) usado na saúde do projeto"""
+    project_id = int(project_id)
+    def build():
+        rv = db.fetch_project_risks(project_id)
+        level = rv['probability'].astype(object).map(logic.RISK_LEVELS).fillna(0).astype(int) if not rv.empty else pd.Series(dtype=int)
+        return {'project_id': project_id, 'total': len(rv), 'high': int((level == 2).sum()), 'medium': int((level == 1).sum()),
+                'risks': _records(rv.assign(level=level))}
+    return _cached("risks", project_id, ("risks",), build)
+
+# =========================================================
+# AGENDA
+# =========================================================
+def calendar_events(projects):
+    """Eventos de calendário (formato FullCalendar) para os projetos do frame"""
+    ev = projects.assign(start=projects['start_date'].dt.strftime('%Y-%m-%d').fillna(''),
+                         end=projects['end_date'].dt.strftime('%Y-%m-%d').fillna(''),
+                         color=projects['status'].astype(object).map(CAL_COLORS).fillna("#3788d8"))
+    return [{"title": f"{name} ({manager})", "start": start, "end": end, "backgroundColor": color, "borderColor": color, "allDay": True}
+            for name, manager, start, end, color in zip(ev['name'], ev['manager'], ev['start'], ev['end'], ev['color'])]
+
+def task_events(tasks):
+    """Tarefas como eventos menores (ponto na lista do dia), cor pelo status da tarefa"""
+    ev = tasks.assign(start=tasks['start_date'].fillna(tasks['end_date']).dt.strftime('%Y-%m-%d'),
+                      end=tasks['end_date'].dt.strftime('%Y-%m-%d').fillna(''),
+                      color=tasks['status'].astype(object).map(TASK_COLORS).fillna("#9CA3AF"))
+    return [{"title": f"✔ {title} · {name}", "start": start, "end": end, "color": color, "allDay": True, "display": "list-item"}
+            for title, name, start, end, color in zip(ev['title'], ev['name'], ev['start'], ev['end'], ev['color'])]
+
+def month_window(month=None):
+    """Primeiro/último dia do mês e a grade de 6 semanas (domingo a sábado) que o calendário mostra"""
+    first = (month or date.today()).replace(day=1)
+    last = (pd.Timestamp(first) + pd.offsets.MonthEnd(0)).date()
+    grid_start = first - timedelta(days=(first.weekday() + 1) % 7)
+    return first, last, grid_start, grid_start + timedelta(days=41)
+
+def calendar_feed(start, end, include_tasks=False, max_tasks=None):
+    """
+    Eventos (formato FullCalendar) que cruzam a janela [start, end]: projetos ativos e,
+    opcionalmente, até max_tasks tarefas. Listas já serializadas, em cache por janela.
+    """
+    start, end = _date(start), _date(end)
+    max_tasks = CALENDAR_MAX_TASKS if max_tasks is None else max_tasks
+    def build():
+        events = calendar_events(db.fetch_calendar_projects(start, end))
+        tasks_total = tasks_shown = 0
+        if include_tasks:
+            tasks_total = db.count_calendar_tasks(start, end)
+            tasks = db.fetch_calendar_tasks(start, end, limit=max_tasks)
+            tasks_shown = len(tasks)
+            events += task_events(tasks)
+        return {'start': start.isoformat(), 'end': end.isoformat(), 'events': events,
+                'tasks_total': tasks_total, 'tasks_shown': tasks_shown}
+    tables = ("projects", "tasks") if include_tasks else ("projects",)
+    return _cached("calendar", (start, end, include_tasks, max_tasks), tables, build)
+
+def agenda(month=None, upcoming=5, include_tasks=False):
+    """Eventos da grade do mês, inícios/entregas no mês e próximas entregas dos projetos ativos"""
+    first, last, grid_start, grid_end = month_window(_date(month))
+    def build():
+        nxt = db.fetch_upcoming_deliveries(upcoming)
+        nxt = nxt.assign(days_left=(nxt['end_date'] - pd.Timestamp(date.today())).dt.days)
+        counts = db.count_project_milestones(first, last)
+        return {
+            'month': first.isoformat(),
+            'calendar': calendar_feed(grid_start, grid_end, include_tasks),
+            'starts_this_month': counts['starts'],
+            'ends_this_month': counts['ends'],
+            'upcoming': _records(nxt),
+        }
+    return _cached("agenda", (first, upcoming, include_tasks), ("projects", "tasks") if include_tasks else ("projects",), build)
+
+# =========================================================
+# HTTP (JSON)
+# =========================================================
+_ROUTES = {
+    "/dashboard": lambda q: dashboard(q.get('sponsor'), q.get('efficiency', '1') != '0'),
+    "/gantt": lambda q: gantt(q.get('start'), q.get('end'), q.get('project_id')),
+    "/risks": lambda q: risks(q['project_id']),
+    "/agenda": lambda q: agenda(q.get('month'), include_tasks=q.get('tasks', '0') == '1'),
+    "/calendar": lambda q: calendar_feed(q['start'], q['end'], q.get('tasks', '0') == '1'),
+    "/health": lambda q: {'status': 'ok', 'schema_version': db.schema_version()},
+}
+
+# Corpo JSON já codificado por rota+parâmetros; só é reutilizado enquanto o
+# resultado em cache for o mesmo objeto (dados mudaram = novo resultado = nova codificação)
+_bodies = LRUCache(RESULT_CACHE_SIZE)
+
+def _encode(payload):
+    return json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+def _json_body(key, result):
+    hit = _bodies.get(key)
+    if hit is not None and hit[0] is result:
+        return hit[1]
+    body = _encode(result)
+    _bodies.put(key, (result, body))
+    return body
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        route = _ROUTES.get(url.path.rstrip("/") or "/")
+        if route is None:
+            return self._send(404, {'error': f"rota desconhecida: {url.path}", 'routes': sorted(_ROUTES)})
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            result = route(query)
+        except (KeyError, ValueError) as e:
+            return self._send(400, {'error': f"parâmetro inválido: {e}"})
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+        self._send(200, result, (url.path, tuple(sorted(query.items()))))
+
+    def _send(self, status, payload, cache_key=None):
+        body = _json_body(cache_key, payload) if cache_key else _encode(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def make_server(host="127.0.0.1", port=8765):
+    """Servidor HTTP com uma thread por requisição (as conexões SQLite vêm do pool do processo, db.connection)"""
+    db.ensure_db()
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dados do Dashboard, Gantt, Riscos e Agenda em JSON")
+    parser.add_argument("--db", default=db.DB_PATH, help="Arquivo SQLite (padrão: %(default)s)")
+    sub = parser.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("serve", help="Servidor HTTP local")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p = sub.add_parser("dashboard")
+    p.add_argument("--sponsor", default=None)
+    p = sub.add_parser("gantt")
+    p.add_argument("--start", default=None)
+    p.add_argument("--end", default=None)
+    p.add_argument("--project", type=int, default=None)
+    p = sub.add_parser("risks")
+    p.add_argument("project_id", type=int)
+    p = sub.add_parser("agenda")
+    p.add_argument("--month", default=None, help="Qualquer dia do mês (AAAA-MM-DD). Padrão: mês atual")
+    p.add_argument("--tasks", action="store_true", help="Inclui tarefas como eventos")
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    if args.action == "serve":
+        server = make_server(args.host, args.port)
+        print(f"Servindo em http://{args.host}:{server.server_port} ({', '.join(sorted(_ROUTES))})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+    db.ensure_db()
+    if args.action == "dashboard":
+        result = dashboard(args.sponsor)
+    elif args.action == "gantt":
+        result = gantt(args.start, args.end, args.project)
+    elif args.action == "risks":
+        result = risks(args.project_id)
+    else:
+        result = agenda(args.month, include_tasks=args.tasks)
+    sys.stdout.write(json.dumps(result, ensure_ascii=False, indent=2, default=str) + "\n")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file